@@ -5,10 +5,18 @@ Social Media Downloader — Multi-Platform
 Features: Profile Grabber, Analytics, Bulk Download, Comments, Search, Watermark Removal
 """
 
-import os, re, json, uuid, time, threading, traceback, shutil, tempfile, sqlite3, logging, subprocess
+import os, re, json, uuid, time, threading, traceback, shutil, tempfile, sqlite3, logging, subprocess, asyncio, copy, heapq, itertools, mimetypes, struct, tarfile, zlib, hashlib, stat, unicodedata
 import httpx
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from yt_dlp import YoutubeDL
+from yt_dlp.cookies import YoutubeDLCookieJar
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext, ExitStack
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import quote as url_quote, urlsplit, urlunsplit
+from werkzeug.security import safe_join
 try:
     from curl_cffi import requests as cffi_requests
     HAS_CURL_CFFI = True
@@ -180,18 +188,454 @@ if HAS_WATERMARK_REMOVER:
 else:
     logging.warning(f'WatermarkRemover-AI not found at: {WATERMARK_REMOVER_DIR}')
 
-download_progress = {}
-profile_tasks = {}
-sora_tasks = {}  # {task_id: {status, urls, results, ...}}
+# ==================== Task State & Events ====================
+# Task dicts publish a change event on every top-level write, so
+# /api/events/<task_id> can push deltas over Server-Sent Events instead of the
+# UI polling whole task dicts. Nested mutations (list.append) are picked up by
+# the next top-level write or heartbeat.
+#
+# Each store keeps live tasks in memory and writes a task to SQLite whenever
+# its status changes. Finished tasks stay hot for TASK_HOT_TTL seconds after
+# last access (at most TASK_HOT_MAX per store), then only live on disk and are
+# loaded back on lookup. Tasks that were still running when the process died
+# come back as errors.
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', '15'))          # seconds between keep-alives
+SSE_MIN_INTERVAL = float(os.environ.get('SSE_MIN_INTERVAL', '0.25'))  # coalesce bursts of updates
+TERMINAL_STATUSES = {'completed', 'error', 'batch_completed', 'unknown'}
+TASK_STORE_DB = os.environ.get('TASK_STORE_DB',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tasks.db'))
+TASK_HOT_MAX = int(os.environ.get('TASK_HOT_MAX', '200'))        # finished tasks kept in memory, per store
+TASK_HOT_TTL = int(os.environ.get('TASK_HOT_TTL', '600'))        # seconds since last access
+TASK_RETENTION = int(os.environ.get('TASK_RETENTION', str(7 * 86400)))  # seconds kept on disk
+
+
+class TaskEvents:
+    """Per-task change counters that event streams block on."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._conds = {}
+
+    def publish(self, task_id):
+        with self._lock:
+            self._versions[task_id] = self._versions.get(task_id, 0) + 1
+            cond = self._conds.get(task_id)
+            if cond:
+                cond.notify_all()
+
+    def wait(self, task_id, seen, timeout):
+        """Block until task_id's version differs from seen or timeout expires; return the version."""
+        with self._lock:
+            cond = self._conds.get(task_id)
+            if cond is None:
+                cond = self._conds[task_id] = threading.Condition(self._lock)
+            cond.wait_for(lambda: self._versions.get(task_id, 0) != seen, timeout)
+            return self._versions.get(task_id, 0)
+
+    def forget(self, task_id):
+        with self._lock:
+            self._versions.pop(task_id, None)
+            cond = self._conds.pop(task_id, None)
+            if cond:
+                cond.notify_all()
+
+
+task_events = TaskEvents()
+
+
+class TaskDB:
+    """SQLite table holding the last persisted state of every task."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._writes = 0
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS tasks (store TEXT NOT NULL, task_id TEXT NOT NULL, '
+                             'status TEXT, state TEXT NOT NULL, updated_at REAL NOT NULL, '
+                             'PRIMARY KEY (store, task_id))')
+            self._db.execute('DELETE FROM tasks WHERE updated_at < ?', (time.time() - TASK_RETENTION,))
+            self._db.commit()
+        except Exception as e:
+            logging.warning(f'Task store: SQLite persistence disabled ({e})')
+            self._db = None
+
+    def save(self, store, task_id, state):
+        if self._db is None:
+            return
+        try:
+            blob = json.dumps(state, ensure_ascii=False, default=str)
+        except Exception as e:
+            logging.warning(f'Task {task_id} not persisted: {e}')
+            return
+        with self._lock:
+            try:
+                self._db.execute('INSERT OR REPLACE INTO tasks (store, task_id, status, state, updated_at) '
+                                 'VALUES (?, ?, ?, ?, ?)', (store, task_id, state.get('status'), blob, time.time()))
+                self._writes += 1
+                if self._writes % 500 == 0:
+                    self._db.execute('DELETE FROM tasks WHERE updated_at < ?', (time.time() - TASK_RETENTION,))
+                self._db.commit()
+            except Exception as e:
+                logging.warning(f'Task store write failed: {e}')
+
+    def load(self, store, task_id):
+        if self._db is None:
+            return None
+        with self._lock:
+            try:
+                row = self._db.execute('SELECT state FROM tasks WHERE store = ? AND task_id = ?',
+                                       (store, task_id)).fetchone()
+            except Exception:
+                row = None
+        return json.loads(row[0]) if row else None
+
+    def delete(self, store, task_id):
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.execute('DELETE FROM tasks WHERE store = ? AND task_id = ?', (store, task_id))
+                self._db.commit()
+            except Exception:
+                pass
+
+    def count(self, store):
+        if self._db is None:
+            return 0
+        with self._lock:
+            try:
+                return self._db.execute('SELECT COUNT(*) FROM tasks WHERE store = ?', (store,)).fetchone()[0]
+            except Exception:
+                return 0
+
+
+task_db = TaskDB(TASK_STORE_DB)
+
+
+class TaskState(dict):
+    """A task's progress dict. Writes take a per-task lock and bump `version`;
+    readers use snapshot() so they never serialize a half-applied update.
+    Every write publishes a change event and status changes are persisted by
+    the owning TaskStore."""
+
+    def __init__(self, data=(), task_id=None, store=None):
+        super().__init__(data)
+        self.task_id = task_id
+        self.store = store
+        self.version = 0
+        self._lock = threading.RLock()
+        self._snap = None  # (version, snapshot dict)
+
+    def _write(self, op, *args):
+        with self._lock:
+            old_status = dict.get(self, 'status')
+            result = op(self, *args)
+            self.version += 1
+            status_changed = dict.get(self, 'status') != old_status
+        task_events.publish(self.task_id)
+        if self.store is not None:
+            self.store._written(self, status_changed)
+        return result
+
+    def __setitem__(self, key, value):
+        self._write(dict.__setitem__, key, value)
+
+    def __delitem__(self, key):
+        self._write(dict.__delitem__, key)
+
+    def update(self, *args, **kwargs):
+        self._write(lambda d: dict.update(d, *args, **kwargs))
+
+    def setdefault(self, key, default=None):
+        return self._write(dict.setdefault, key, default)
+
+    def pop(self, *args):
+        return self._write(dict.pop, *args)
+
+    def replace(self, data):
+        """Swap in a whole new state atomically (keeps this object's identity)."""
+        data = dict(data)
+        self._write(lambda d: (dict.clear(d), dict.update(d, data)))
+
+    def snapshot(self):
+        """Point-in-time copy of the task, cached per version. Nested dicts are
+        copied; lists are shared (appends are safe to serialize). Read-only."""
+        with self._lock:
+            if self._snap is None or self._snap[0] != self.version:
+                self._snap = (self.version, {k: dict(v) if isinstance(v, dict) else v
+                                             for k, v in dict.items(self)})
+            return self._snap[1]
+
+
+class TaskStore(dict):
+    """task_id -> TaskState. Plain dicts assigned in are wrapped, so the
+    existing `store[task_id] = {...}` idiom keeps working, publishes events
+    and persists status changes. Lookups fall back to the SQLite copy."""
+
+    def __init__(self, name, view=None, db=task_db):
+        from collections import OrderedDict
+        super().__init__()
+        self.name = name
+        self._view = view
+        self._db = db
+        self._finished = OrderedDict()  # task_id -> last access, oldest first
+        self._lock = threading.RLock()
+
+    def __setitem__(self, task_id, state):
+        existing = dict.get(self, task_id)
+        if existing is not None:
+            # progress_hook and friends replace the whole dict on every tick:
+            # swap the contents in place so readers and holders of the old
+            # reference see one consistent state (only status changes persist)
+            if existing is not state:
+                existing.replace(state)
+            return
+        if not isinstance(state, TaskState) or state.task_id != task_id:
+            state = TaskState(state, task_id)
+        state.store = self
+        with self._lock:
+            super().__setitem__(task_id, state)
+        task_events.publish(task_id)
+        self._written(state, True)
+
+    def __getitem__(self, task_id):
+        state = self.get(task_id)
+        if state is None:
+            raise KeyError(task_id)
+        return state
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+    def get(self, task_id, default=None):
+        state = dict.get(self, task_id)
+        if state is None:
+            state = self._load(task_id)
+        elif task_id in self._finished:
+            with self._lock:
+                if task_id in self._finished:
+                    self._finished[task_id] = time.time()
+                    self._finished.move_to_end(task_id)
+        return default if state is None else state
+
+    def __delitem__(self, task_id):
+        self.pop(task_id)
+
+    def pop(self, task_id, *default):
+        with self._lock:
+            self._finished.pop(task_id, None)
+            value = super().pop(task_id, *default)
+        self._db.delete(self.name, task_id)
+        task_events.forget(task_id)
+        return value
+
+    def view(self, task):
+        """JSON-safe copy of a task as exposed to clients."""
+        return self._view(task) if self._view else copy.deepcopy(task.snapshot())
+
+    def snapshot(self, task_id, default=None):
+        """Consistent read-only copy of a task for serializing, or default."""
+        state = self.get(task_id)
+        return state.snapshot() if state is not None else default
+
+    def stats(self):
+        with self._lock:
+            return {'hot': dict.__len__(self), 'hot_finished': len(self._finished),
+                    'persisted': self._db.count(self.name)}
+
+    def _written(self, state, status_changed):
+        task_id = state.task_id
+        with self._lock:
+            current = dict.get(self, task_id)
+            if current is None:
+                super().__setitem__(task_id, state)  # evicted, but a worker is still writing
+            elif current is not state:
+                return  # a replaced dict — the live one is persisted on its own writes
+            if status_changed:
+                if state.get('status') in TERMINAL_STATUSES:
+                    self._finished[task_id] = time.time()
+                    self._finished.move_to_end(task_id)
+                else:
+                    self._finished.pop(task_id, None)
+        if status_changed:
+            self._db.save(self.name, task_id, state.snapshot())
+            self._evict()
+
+    def _load(self, task_id):
+        data = self._db.load(self.name, task_id)
+        if data is None:
+            return None
+        state = TaskState(data, task_id, self)
+        interrupted = state.get('status') not in TERMINAL_STATUSES
+        if interrupted:
+            # Its worker died with the previous process
+            dict.update(state, {'status': 'error', 'error': 'Interrupted by a server restart',
+                                'message': 'Interrupted by a server restart'})
+            self._db.save(self.name, task_id, state.snapshot())
+        with self._lock:
+            current = dict.get(self, task_id)
+            if current is not None:
+                return current
+            super().__setitem__(task_id, state)
+            self._finished[task_id] = time.time()
+        self._evict()
+        return state
+
+    def _evict(self):
+        cutoff = time.time() - TASK_HOT_TTL
+        evicted = []
+        with self._lock:
+            while self._finished:
+                task_id, last_access = next(iter(self._finished.items()))
+                if len(self._finished) <= TASK_HOT_MAX and last_access >= cutoff:
+                    break
+                del self._finished[task_id]
+                state = super().pop(task_id, None)
+                if state is not None:
+                    evicted.append((task_id, state))
+        for task_id, state in evicted:
+            # Persist the final state, including nested changes made since the status write
+            self._db.save(self.name, task_id, state.snapshot())
+            task_events.forget(task_id)
+
+
+def _live_videos(task):
+    """Start a grabber's result list on the task itself, so clients can page
+    through posts (/api/profile/status?since=N) while the grab is running.
+    Posts the list already holds are skipped (see MediaList)."""
+    task['videos'] = videos = MediaList(task.get('platform', ''))
+    return videos
+
+
+def _profile_task_view(task, with_videos=False):
+    # The video list can be thousands of entries; clients fetch it in pages.
+    # 'seq' is how many posts exist so far; 'list_id' changes if a grabber
+    # replaces its list (e.g. a fallback restarts), telling clients to resync.
+    # The task keeps a reference to the list its id was issued for, so a
+    # replacement is caught by identity even if Python reuses the address.
+    list_id = ''
+    if isinstance(task, TaskState):
+        state, task = task, task.snapshot()
+        current = task.get('videos')
+        issued = getattr(state, '_list_id', None)
+        if issued is None or issued[0] is not current:
+            issued = state._list_id = (current, uuid.uuid4().hex[:8])
+        list_id = issued[1]
+    videos = task.get('videos') or []
+    view = {
+        'status': task.get('status'), 'message': task.get('message', ''),
+        'total': task.get('total', 0), 'profile': copy.deepcopy(task.get('profile')),
+        'platform': task.get('platform', ''),
+        'seq': len(videos), 'list_id': list_id,
+    }
+    if with_videos:
+        view['videos'] = videos
+    return view
+
+
+download_progress = TaskStore('download')
+profile_tasks = TaskStore('profile', view=_profile_task_view)
+sora_tasks = TaskStore('sora')  # {task_id: {status, urls, results, ...}}
 
 # Facebook cookies support — place a 'cookies.txt' (Netscape format) in the app folder
 COOKIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cookies.txt')
+COOKIES_CHECK_INTERVAL = float(os.environ.get('COOKIES_CHECK_INTERVAL', '2'))  # seconds between mtime checks
+
+
+class CookieStore:
+    """cookies.txt parsed once into a jar plus a per-domain index.
+
+    yt-dlp, curl_cffi and httpx are all served from this in-memory copy. The
+    file's mtime is re-checked at most every COOKIES_CHECK_INTERVAL seconds and
+    the jar is re-parsed only when it changed (or on upload via refresh(force=True)).
+    """
+
+    def __init__(self, path):
+        self.file = path
+        self.generation = 0  # bumped on every re-parse
+        self._lock = threading.Lock()
+        self._mtime = None  # None while the file is missing
+        self._checked = 0.0
+        self._jar = YoutubeDLCookieJar()
+        self._by_domain = {}  # 'facebook.com' -> {name: value}
+        self._listeners = []  # called when the file appears or disappears
+        self.refresh(force=True)
+
+    def on_presence_change(self, callback):
+        self._listeners.append(callback)
+
+    def refresh(self, force=False):
+        now = time.time()
+        if not force and now - self._checked < COOKIES_CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.stat(self.file).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime == self._mtime and not force:
+                return
+            existed = self._mtime is not None
+            jar, by_domain = YoutubeDLCookieJar(), {}
+            if mtime is not None:
+                try:
+                    jar.load(self.file, ignore_discard=True, ignore_expires=True)
+                except Exception as e:
+                    logging.warning(f"cookies.txt could not be parsed: {e}")
+                for c in jar:
+                    by_domain.setdefault(c.domain.lstrip('.').lower(), {})[c.name] = c.value
+            self._jar, self._by_domain, self._mtime = jar, by_domain, mtime
+            self.generation += 1
+        if existed != (mtime is not None):
+            for callback in self._listeners:
+                callback()
+
+    def path(self):
+        """The cookies.txt path if it exists, else None."""
+        self.refresh()
+        return self.file if self._mtime is not None else None
+
+    def domains(self):
+        self.refresh()
+        return set(self._by_domain)
+
+    def cookies_for(self, domain):
+        """{name: value} for domain and its subdomains — for curl_cffi/httpx `cookies=`."""
+        self.refresh()
+        domain = domain.lower()
+        suffix = '.' + domain
+        cookies = {}
+        for d, values in self._by_domain.items():
+            if d == domain or d.endswith(suffix):
+                cookies.update(values)
+        return cookies
+
+    def ydl_jar(self):
+        """A fresh jar for one YoutubeDL, seeded from memory instead of re-parsing
+        the file. Pooled instances never save it back (see _close_ydl)."""
+        self.refresh()
+        with self._lock:
+            cookies, generation = list(self._jar), self.generation
+        jar = YoutubeDLCookieJar(self.file)
+        for c in cookies:
+            jar.set_cookie(copy.copy(c))
+        return jar, generation
+
+    def stats(self):
+        return {'present': self._mtime is not None, 'domains': len(self._by_domain),
+                'cookies': len(self._jar), 'generation': self.generation}
+
+
+cookie_store = CookieStore(COOKIES_FILE)
+
 
 def _get_cookies_file():
     """Return cookies.txt path if it exists, else None."""
-    if os.path.isfile(COOKIES_FILE):
-        return COOKIES_FILE
-    return None
+    return cookie_store.path()
 
 def _try_copy_browser_cookies(browser='chrome'):
     """Try to safely copy locked browser cookie DB for yt-dlp usage."""
@@ -203,23 +647,8 @@ def _try_copy_browser_cookies(browser='chrome'):
         return None
 
 def _get_facebook_cookies_for_cffi():
-    """Load cookies from cookies.txt for curl_cffi requests."""
-    cookies = {}
-    cfile = _get_cookies_file()
-    if not cfile:
-        return cookies
-    try:
-        with open(cfile, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                parts = line.split('\t')
-                if len(parts) >= 7 and '.facebook.com' in parts[0]:
-                    cookies[parts[5]] = parts[6]
-    except Exception:
-        pass
-    return cookies
+    """Facebook cookies from cookies.txt for curl_cffi requests."""
+    return cookie_store.cookies_for('facebook.com')
 
 # ==================== Facebook Graph API ====================
 FB_GRAPH_API_VERSION = 'v21.0'
@@ -254,16 +683,15 @@ def fb_graph_request(endpoint, params=None, token=None):
         'Content-Type': 'application/json',
     }
     try:
-        with httpx.Client(headers=headers, timeout=30, follow_redirects=True) as c:
-            r = c.get(url, params=params or {})
-            if r.status_code == 200:
-                return r.json()
-            elif r.status_code == 400:
-                err = r.json()
-                err_msg = err.get('error', {}).get('message', '')
-                return {'error': True, 'message': err_msg, 'code': r.status_code}
-            else:
-                return {'error': True, 'message': f'HTTP {r.status_code}', 'code': r.status_code}
+        r = http_get(url, params=params, headers=headers)
+        if r.status_code == 200:
+            return r.json()
+        elif r.status_code == 400:
+            err = r.json()
+            err_msg = err.get('error', {}).get('message', '')
+            return {'error': True, 'message': err_msg, 'code': r.status_code}
+        else:
+            return {'error': True, 'message': f'HTTP {r.status_code}', 'code': r.status_code}
     except Exception as e:
         return {'error': True, 'message': str(e)}
 
@@ -358,8 +786,120 @@ PLATFORMS = {
 }
 
 # ==================== URL Utilities ====================
-def detect_platform(url):
-    url = url.lower()
+# URLs are classified by host: one regex built from the host table finds the
+# longest known suffix ("m.tiktok.com" -> "tiktok.com"), then only that
+# platform's precompiled profile / username / ID regexes run. classify_url() does it all
+# in one pass and caches the result, so detect_platform, is_profile_url,
+# extract_username and extract_video_id on the same URL share the work.
+URL_CLASSIFY_CACHE = int(os.environ.get('URL_CLASSIFY_CACHE', '8192'))
+
+_PLATFORM_HOSTS = {
+    'tiktok.com': 'tiktok',
+    'douyin.com': 'douyin',
+    'youtube.com': 'youtube', 'youtu.be': 'youtube',
+    'instagram.com': 'instagram',
+    'facebook.com': 'facebook', 'fb.watch': 'facebook', 'fb.com': 'facebook',
+    'twitter.com': 'twitter', 'x.com': 'twitter',
+    'pinterest.com': 'pinterest', 'pin.it': 'pinterest',
+    'kuaishou.com': 'kuaishou', 'kwai.com': 'kuaishou', 'gifshow.com': 'kuaishou',
+    'sora.com': 'sora', 'sora.chatgpt.com': 'sora', 'chatgpt.com': 'sora', 'openai.com': 'sora',
+    'xiaohongshu.com': 'xiaohongshu', 'xhslink.com': 'xiaohongshu',
+    'threads.net': 'threads',
+    'linkedin.com': 'linkedin',
+    'reddit.com': 'reddit', 'redd.it': 'reddit',
+    'bilibili.com': 'bilibili', 'b23.tv': 'bilibili',
+    'weibo.com': 'weibo', 'weibo.cn': 'weibo',
+    'lemon8-app.com': 'lemon8', 'lemon8.com': 'lemon8',
+    'zhihu.com': 'zhihu',
+    'weixin.qq.com': 'wechat',
+    'pipix.com': 'pipixia',
+}
+# Shared hosts that only count as Sora with this marker in the URL
+_HOST_REQUIRES = {'chatgpt.com': '/p/s_', 'openai.com': 'sora'}
+# scheme, userinfo, then the shortest subdomain prefix so the longest known
+# suffix wins ("sora.chatgpt.com" before "chatgpt.com")
+_PLATFORM_HOST_RE = re.compile(
+    r'(?:[a-z][a-z0-9+.-]*:)?(?://)?(?:[^/?#@]*@)?(?:[^/?#:@]*?\.)??('
+    + '|'.join(re.escape(h) for h in sorted(_PLATFORM_HOSTS, key=len, reverse=True))
+    + r')\.?(?:[:/?#]|$)')
+
+_PROFILE_PATTERNS = {
+    'tiktok':      [r'tiktok\.com/@[\w.-]+/?$', r'tiktok\.com/@[\w.-]+\?'],
+    'douyin':      [r'douyin\.com/user/', r'v\.douyin\.com/'],
+    'youtube':     [r'youtube\.com/@[\w.-]+', r'youtube\.com/c/', r'youtube\.com/channel/', r'youtube\.com/user/'],
+    'instagram':   [r'instagram\.com/[\w.-]+/?$', r'instagram\.com/[\w.-]+/?\?'],
+    'facebook':    [r'facebook\.com/[\w.-]+/?$', r'facebook\.com/profile\.php'],
+    'twitter':     [r'(twitter|x)\.com/[\w]+/?$', r'(twitter|x)\.com/[\w]+\?'],
+    'pinterest':   [r'pinterest\.com/[\w.-]+/?$', r'pinterest\.com/[\w.-]+/[\w.-]+'],
+    'kuaishou':    [r'kuaishou\.com/profile/', r'kwai\.com/@'],
+    'xiaohongshu': [r'xiaohongshu\.com/user/profile/'],
+    'threads':     [r'threads\.net/@[\w.-]+/?$'],
+    'linkedin':    [r'linkedin\.com/in/[\w.-]+'],
+    'reddit':      [r'reddit\.com/user/[\w.-]+', r'reddit\.com/r/[\w.-]+'],
+    'bilibili':    [r'bilibili\.com/space/', r'space\.bilibili\.com/'],
+    'weibo':       [r'weibo\.com/u/', r'weibo\.com/[\w]+/?$'],
+    'lemon8':      [r'lemon8.*/@[\w.-]+/?$'],
+    'zhihu':       [r'zhihu\.com/people/'],
+    'wechat':      [r'mp\.weixin\.qq\.com/mp/profile'],
+    'pipixia':     [r'pipix\.com/user/'],
+}
+_USERNAME_PATTERNS = {
+    'tiktok':      r'tiktok\.com/@([\w.-]+)',
+    'youtube':     r'youtube\.com/(?:@|c/|channel/|user/)([\w.-]+)',
+    'instagram':   r'instagram\.com/([\w.-]+)',
+    'facebook':    r'facebook\.com/([\w.-]+)',
+    'twitter':     r'(?:twitter|x)\.com/([\w]+)',
+    'pinterest':   r'pinterest\.com/([\w.-]+)',
+    'kuaishou':    r'(?:kuaishou\.com/profile/|kwai\.com/@)([\w.-]+)',
+    'xiaohongshu': r'xiaohongshu\.com/user/profile/([\w]+)',
+    'threads':     r'threads\.net/@([\w.-]+)',
+    'linkedin':    r'linkedin\.com/in/([\w.-]+)',
+    'reddit':      r'reddit\.com/(?:user|r)/([\w.-]+)',
+    'bilibili':    r'(?:space\.bilibili|bilibili\.com/space)/([\d]+)',
+    'weibo':       r'weibo\.com/(?:u/)?([\w]+)',
+    'lemon8':      r'lemon8.*/@([\w.-]+)',
+    'zhihu':       r'zhihu\.com/people/([\w.-]+)',
+    'pipixia':     r'pipix\.com/user/([\d]+)',
+}
+_VIDEO_ID_PATTERNS = {
+    'tiktok':      r'tiktok\.com/(?:@[\w.-]+/(?:video|photo)|v|embed(?:/v2)?)/(\d+)',
+    'douyin':      r'douyin\.com/(?:video|note)/(\d+)|modal_id=(\d+)',
+    'youtube':     r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([\w-]{11})',
+    'instagram':   r'instagram\.com/(?:[\w.-]+/)?(?:p|reels?|tv)/([\w-]+)',
+    'facebook':    r'(?:[?&](?:v|fbid|story_fbid)=|/videos/(?:[\w.-]+/)?|/reel/)(\d+)',
+    'twitter':     r'(?:twitter|x)\.com/[\w]+/status/(\d+)',
+    'pinterest':   r'pinterest\.[\w.]+/pin/(\d+)',
+    'kuaishou':    r'(?:kuaishou|kwai)\.com/(?:short-video|photo|fw/photo)/([\w-]+)',
+    'xiaohongshu': r'xiaohongshu\.com/(?:explore|discovery/item)/(\w+)',
+    'threads':     r'threads\.net/@[\w.-]+/post/([\w-]+)',
+    'linkedin':    r'linkedin\.com/(?:posts/[\w.%-]+-|feed/update/urn:li:activity:)(\d+)',
+    'reddit':      r'reddit\.com/(?:r/[\w.-]+/)?comments/(\w+)',
+    'bilibili':    r'bilibili\.com/video/(BV\w+|av\d+)',
+    'weibo':       r'weibo\.(?:com|cn)/(?:\d+/|detail/|status/)(\w+)',
+    'pipixia':     r'pipix\.com/item/(\d+)',
+}
+# One alternation per platform instead of a list of searches
+_PROFILE_RE = {pf: re.compile('|'.join(f'(?:{p})' for p in pats), re.I) for pf, pats in _PROFILE_PATTERNS.items()}
+_USERNAME_RE = {pf: re.compile(p, re.I) for pf, p in _USERNAME_PATTERNS.items()}
+_VIDEO_ID_RE = {pf: re.compile(p, re.I) for pf, p in _VIDEO_ID_PATTERNS.items()}
+
+UrlInfo = namedtuple('UrlInfo', 'platform kind username media_id')  # kind: 'profile', 'post' or None
+
+
+def _platform_by_host(url):
+    """Platform for an already lower-cased URL by its host, or None."""
+    m = _PLATFORM_HOST_RE.match(url)
+    if not m:
+        return None
+    marker = _HOST_REQUIRES.get(m.group(1))
+    if marker is not None and marker not in url:
+        return None
+    return _PLATFORM_HOSTS[m.group(1)]
+
+
+def _platform_by_substring(url):
+    """Original ordered substring scan, for URLs whose host isn't a known platform
+    (redirect wrappers, pasted text)."""
     if 'tiktok.com' in url:      return 'tiktok'
     if 'douyin.com' in url:      return 'douyin'
     if 'youtube.com' in url or 'youtu.be' in url: return 'youtube'
@@ -383,6 +923,38 @@ def detect_platform(url):
     if 'pipix.com' in url or 'pipixia' in url: return 'pipixia'
     return None
 
+
+def _match_username(url, platform):
+    pat = _USERNAME_RE.get(platform)
+    m = pat.search(url) if pat else None
+    return m.group(1) if m else None
+
+
+def _match_video_id(url, platform):
+    if platform == 'sora':
+        return _sora_extract_video_id(url)[0]
+    pat = _VIDEO_ID_RE.get(platform)
+    m = pat.search(url) if pat else None
+    return next(g for g in m.groups() if g) if m else None
+
+
+@lru_cache(maxsize=URL_CLASSIFY_CACHE)
+def classify_url(url):
+    """Platform, kind ('profile' / 'post' / None), username and media ID of a URL."""
+    lowered = url.strip().lower()
+    platform = _platform_by_host(lowered) or _platform_by_substring(lowered)
+    if platform is None:
+        return UrlInfo(None, None, None, None)
+    profile = _PROFILE_RE.get(platform)
+    is_profile = bool(profile and profile.search(url))
+    media_id = None if is_profile else _match_video_id(url, platform)
+    kind = 'profile' if is_profile else ('post' if media_id else None)
+    return UrlInfo(platform, kind, _match_username(url, platform), media_id)
+
+
+def detect_platform(url):
+    return classify_url(url).platform
+
 def is_valid_url(url):
     return bool(re.match(r'https?://', url)) and detect_platform(url) is not None
     # Also accept generic URLs for yt-dlp fallback
@@ -390,59 +962,313 @@ def is_valid_url(url):
 
 def is_profile_url(url):
     """Check if URL is a profile/channel rather than single video."""
-    pf = detect_platform(url)
-    profile_patterns = {
-        'tiktok':      [r'tiktok\.com/@[\w.-]+/?$', r'tiktok\.com/@[\w.-]+\?'],
-        'douyin':      [r'douyin\.com/user/', r'v\.douyin\.com/'],
-        'youtube':     [r'youtube\.com/@[\w.-]+', r'youtube\.com/c/', r'youtube\.com/channel/', r'youtube\.com/user/'],
-        'instagram':   [r'instagram\.com/[\w.-]+/?$', r'instagram\.com/[\w.-]+/?\?'],
-        'facebook':    [r'facebook\.com/[\w.-]+/?$', r'facebook\.com/profile\.php'],
-        'twitter':     [r'(twitter|x)\.com/[\w]+/?$', r'(twitter|x)\.com/[\w]+\?'],
-        'pinterest':   [r'pinterest\.com/[\w.-]+/?$', r'pinterest\.com/[\w.-]+/[\w.-]+'],
-        'kuaishou':    [r'kuaishou\.com/profile/', r'kwai\.com/@'],
-        'xiaohongshu': [r'xiaohongshu\.com/user/profile/'],
-        'threads':     [r'threads\.net/@[\w.-]+/?$'],
-        'linkedin':    [r'linkedin\.com/in/[\w.-]+'],
-        'reddit':      [r'reddit\.com/user/[\w.-]+', r'reddit\.com/r/[\w.-]+'],
-        'bilibili':    [r'bilibili\.com/space/', r'space\.bilibili\.com/'],
-        'weibo':       [r'weibo\.com/u/', r'weibo\.com/[\w]+/?$'],
-        'lemon8':      [r'lemon8.*/@[\w.-]+/?$'],
-        'zhihu':       [r'zhihu\.com/people/'],
-        'wechat':      [r'mp\.weixin\.qq\.com/mp/profile'],
-        'pipixia':     [r'pipix\.com/user/'],
-    }
-    for pat in profile_patterns.get(pf, []):
-        if re.search(pat, url, re.I):
-            return True
-    return False
+    return classify_url(url).kind == 'profile'
 
 def extract_username(url, platform=None):
-    if not platform:
-        platform = detect_platform(url)
-    patterns = {
-        'tiktok':      r'tiktok\.com/@([\w.-]+)',
-        'youtube':     r'youtube\.com/(?:@|c/|channel/|user/)([\w.-]+)',
-        'instagram':   r'instagram\.com/([\w.-]+)',
-        'facebook':    r'facebook\.com/([\w.-]+)',
-        'twitter':     r'(?:twitter|x)\.com/([\w]+)',
-        'pinterest':   r'pinterest\.com/([\w.-]+)',
-        'kuaishou':    r'(?:kuaishou\.com/profile/|kwai\.com/@)([\w.-]+)',
-        'xiaohongshu': r'xiaohongshu\.com/user/profile/([\w]+)',
-        'threads':     r'threads\.net/@([\w.-]+)',
-        'linkedin':    r'linkedin\.com/in/([\w.-]+)',
-        'reddit':      r'reddit\.com/(?:user|r)/([\w.-]+)',
-        'bilibili':    r'(?:space\.bilibili|bilibili\.com/space)/([\d]+)',
-        'weibo':       r'weibo\.com/(?:u/)?([\w]+)',
-        'lemon8':      r'lemon8.*/@([\w.-]+)',
-        'zhihu':       r'zhihu\.com/people/([\w.-]+)',
-        'pipixia':     r'pipix\.com/user/([\d]+)',
-    }
-    pat = patterns.get(platform, '')
-    if pat:
-        m = re.search(pat, url, re.I)
-        if m:
-            return m.group(1)
-    return None
+    info = classify_url(url)
+    if platform and platform != info.platform:
+        return _match_username(url, platform)
+    return info.username
+
+def extract_video_id(url, platform=None):
+    """Return the platform's canonical ID for a single post/video URL, or None."""
+    info = classify_url(url)
+    if platform and platform != info.platform:
+        return _match_video_id(url, platform)
+    if info.kind == 'profile':
+        # classify_url skips the ID lookup for profile URLs
+        return _match_video_id(url, info.platform)
+    return info.media_id
+
+# ==================== Media Identity & Dedup ====================
+# Every post is identified by (platform, media_id). The ID parsed from the
+# post URL wins over a grabber's own 'id' field, so the same post reached
+# through different APIs, grabbers or searches collapses to one key.
+def media_key(platform, media_id=None, url=''):
+    """Canonical (platform, media_id) of a post, or None when it has no ID."""
+    platform = platform or (detect_platform(url) if url else '') or ''
+    vid = extract_video_id(url, platform) if url else None
+    if vid:
+        return (platform, vid)
+    if media_id is None or str(media_id).strip() == '':
+        return None
+    return (platform, str(media_id).strip())
+
+
+def item_media_key(item, platform=''):
+    return media_key(item.get('platform') or platform, item.get('id'),
+                     item.get('url') or item.get('webpage_url') or '')
+
+
+class MediaList(list):
+    """Result list that drops posts it already holds, keyed by media_key in
+    O(1). append() returns False for a duplicate; posts without an ID are
+    always kept."""
+
+    def __init__(self, platform='', items=()):
+        super().__init__()
+        self.platform = platform
+        self._keys = set()
+        self.extend(items)
+
+    def __reduce__(self):
+        return (MediaList, (self.platform, list(self)))
+
+    def has(self, media_id=None, url=''):
+        key = media_key(self.platform, media_id, url)
+        return key is not None and key in self._keys
+
+    def append(self, item):
+        key = item_media_key(item, self.platform) if isinstance(item, dict) else None
+        if key is not None:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+        super().append(item)
+        return True
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+
+CONTENT_STORE_DIR = '.store'  # inside DOWNLOAD_FOLDER so aliases can be hardlinks (same filesystem)
+
+
+def _file_digest(path):
+    """(sha256 hex, size) of a file."""
+    h, size = hashlib.sha256(), 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _link_file(src, dst, replace=False):
+    """Make dst another name for src; copies when the filesystem has no hardlinks."""
+    tmp = f'{dst}.{uuid.uuid4().hex[:8]}.link' if replace else dst
+    try:
+        os.link(src, tmp)
+    except FileExistsError:
+        return
+    except OSError:
+        shutil.copy2(src, tmp)
+    if replace:
+        os.replace(tmp, dst)
+
+
+class ContentStore:
+    """Downloads kept once by content, found by (platform, media_id, variant).
+
+    'variant' names the output (e.g. 'video:720p:mp4', 'photo'). A finished
+    file is hashed and linked into DOWNLOAD_FOLDER/.store/<ab>/<sha256><ext>;
+    the task's own filename stays as an alias of that blob, and identical
+    bytes reached through another post or variant share it. A request for a
+    stored post gets a new alias without any network work. Rows live next to
+    the task store so they survive restarts, are kept per folder, and are
+    dropped on lookup once the blob is missing or no longer matches its hash.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._folder = None
+        self._blobs = {}  # (platform, media_id, variant) -> (sha256, ext, size, mtime_ns), current folder only
+        self._fetches = {}  # (platform, media_id, variant) -> [Lock, waiters]
+        self.hits = self.misses = self.coalesced = self.deduped = 0
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS content_store (folder TEXT NOT NULL, platform TEXT NOT NULL, '
+                             'media_id TEXT NOT NULL, variant TEXT NOT NULL, sha256 TEXT NOT NULL, ext TEXT NOT NULL, '
+                             'size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, added_at REAL NOT NULL, '
+                             'PRIMARY KEY (folder, platform, media_id, variant))')
+            self._db.commit()
+        except Exception as e:
+            logging.warning(f'Content store: SQLite persistence disabled ({e})')
+            self._db = None
+
+    def _sync(self):
+        # The save location can change at runtime; each folder has its own rows
+        if self._folder == DOWNLOAD_FOLDER:
+            return
+        self._folder, self._blobs = DOWNLOAD_FOLDER, {}
+        if self._db is not None:
+            try:
+                rows = self._db.execute('SELECT platform, media_id, variant, sha256, ext, size, mtime_ns '
+                                        'FROM content_store WHERE folder = ?', (self._folder,)).fetchall()
+                self._blobs = {(p, m, v): tuple(rest) for p, m, v, *rest in rows}
+            except Exception as e:
+                logging.warning(f'Content store load failed: {e}')
+
+    def _execute(self, sql, args):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(sql, args)
+            self._db.commit()
+        except Exception as e:
+            logging.warning(f'Content store write failed: {e}')
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self._folder, CONTENT_STORE_DIR, digest[:2], digest + ext)
+
+    @staticmethod
+    def _intact(blob, digest, size, mtime_ns):
+        try:
+            st = os.stat(blob)
+        except OSError:
+            return False
+        if st.st_size != size:
+            return False
+        # Unchanged since it was stored; otherwise re-check the bytes
+        return st.st_mtime_ns == mtime_ns or _file_digest(blob)[0] == digest
+
+    def _find(self, key, variant):
+        """Blob path for this post and variant, or None (lock held)."""
+        self._sync()
+        entry = self._blobs.get((*key, variant))
+        if not entry:
+            return None
+        digest, ext, size, mtime_ns = entry
+        blob = self.blob_path(digest, ext)
+        if self._intact(blob, digest, size, mtime_ns):
+            return blob
+        del self._blobs[(*key, variant)]
+        self._execute('DELETE FROM content_store WHERE folder = ? AND platform = ? AND media_id = ? '
+                      'AND variant = ?', (self._folder, *key, variant))
+        return None
+
+    def _alias(self, blob, alias):
+        mark_accessed(blob)
+        if alias is None:
+            return blob
+        name = alias + os.path.splitext(blob)[1]
+        _link_file(blob, os.path.join(self._folder, name))
+        return name
+
+    def lookup(self, key, variant, alias=None):
+        """Stored file for this post and variant, or None.
+
+        With alias (a filename stem in DOWNLOAD_FOLDER) the blob is linked
+        under that name and the alias filename is returned; without, the
+        blob's own path.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            blob = self._find(key, variant)
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._alias(blob, alias)
+
+    def ingest(self, key, variant, filename):
+        """Move a finished download in DOWNLOAD_FOLDER into the store and
+        record it under key/variant; filename stays valid as an alias."""
+        path = os.path.join(DOWNLOAD_FOLDER, filename or '')
+        if not filename or not os.path.isfile(path):
+            return filename
+        digest, size = _file_digest(path)
+        ext = os.path.splitext(filename)[1].lower()
+        with self._lock:
+            self._sync()
+            blob = self.blob_path(digest, ext)
+            try:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                if os.path.isfile(blob) and os.path.getsize(blob) == size:
+                    # Same bytes already stored for another task: keep one copy
+                    if not os.path.samefile(blob, path):
+                        _link_file(blob, path, replace=True)
+                        self.deduped += 1
+                else:
+                    _link_file(path, blob, replace=True)
+                mtime_ns = os.stat(blob).st_mtime_ns
+            except OSError as e:
+                logging.warning(f'Content store: could not add {filename} ({e})')
+                return filename
+            if key is not None:
+                self._blobs[(*key, variant)] = (digest, ext, size, mtime_ns)
+                self._execute('INSERT OR REPLACE INTO content_store (folder, platform, media_id, variant, sha256, '
+                              'ext, size, mtime_ns, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                              (self._folder, *key, variant, digest, ext, size, mtime_ns, time.time()))
+        return filename
+
+    @contextmanager
+    def _fetching(self, k):
+        with self._lock:
+            slot = self._fetches.setdefault(k, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._fetches[k]
+
+    def fetch_once(self, key, variant, alias, fetch):
+        """fetch() -> filename in DOWNLOAD_FOLDER, run only if the post isn't
+        stored yet. Concurrent calls for the same post and variant wait for
+        the first and get an alias of its result."""
+        if key is None:
+            return self.ingest(None, variant, fetch())
+        with self._fetching((*key, variant)):
+            with self._lock:
+                blob = self._find(key, variant)
+                if blob is not None:
+                    self.coalesced += 1
+                    return self._alias(blob, alias)
+            return self.ingest(key, variant, fetch())
+
+    def remove(self, paths):
+        """Delete files (e.g. a blob and its aliases) without racing a lookup
+        that is linking the blob; returns how many are gone."""
+        removed = 0
+        with self._lock:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f'Content store: could not remove {path} ({e})')
+                    continue
+                removed += 1
+        return removed
+
+    def prune_shards(self):
+        """Remove emptied .store/<ab>/ directories."""
+        with self._lock:
+            self._sync()
+            root = os.path.join(self._folder, CONTENT_STORE_DIR)
+            try:
+                shards = [e.path for e in os.scandir(root) if e.is_dir(follow_symlinks=False)]
+            except OSError:
+                return
+            for path in shards:
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Forget everything in the current folder and drop its blobs (after /api/clean)."""
+        with self._lock:
+            self._sync()
+            self._blobs.clear()
+            self._execute('DELETE FROM content_store WHERE folder = ?', (self._folder,))
+            shutil.rmtree(os.path.join(self._folder, CONTENT_STORE_DIR), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._blobs), 'hits': self.hits, 'misses': self.misses,
+                    'coalesced': self.coalesced, 'deduped': self.deduped, 'fetching': len(self._fetches)}
+
+
+content_store = ContentStore(TASK_STORE_DB)
 
 # ==================== yt-dlp Configuration ====================
 COMMON_YDL_OPTS = {
@@ -461,7 +1287,7 @@ COMMON_YDL_OPTS = {
 if HAS_FFMPEG:
     COMMON_YDL_OPTS['ffmpeg_location'] = FFMPEG_PATHS['dir']
 
-def get_ydl_opts(platform=None, extra=None):
+def _build_ydl_base(platform):
     opts = {**COMMON_YDL_OPTS}
     if platform == 'tiktok':
         opts['extractor_args'] = {'TikTok': {'api_hostname': ['api22-normal-c-useast2a.tiktokv.com']}}
@@ -527,15 +1353,460 @@ def get_ydl_opts(platform=None, extra=None):
         cfile = _get_cookies_file()
         if cfile:
             opts['cookiefile'] = cfile
+    return opts
+
+
+# Per-platform base option sets are built once (cookie-file probing included)
+# and kept read-only; get_ydl_opts only copies one and layers `extra` on top.
+# /api/cookies/upload calls invalidate_ydl_opts() to rebuild them; if
+# cookies.txt appears or disappears on disk they are dropped and rebuilt lazily.
+_ydl_bases = {}  # platform -> MappingProxyType
+_ydl_bases_lock = threading.RLock()  # building a base can re-enter via the cookie store listener
+
+
+def get_ydl_opts(platform=None, extra=None):
+    base = _ydl_bases.get(platform)
+    if base is None:
+        with _ydl_bases_lock:
+            base = _ydl_bases.get(platform)
+            if base is None:
+                base = _ydl_bases[platform] = MappingProxyType(_build_ydl_base(platform))
+    opts = dict(base)
     if extra:
         opts.update(extra)
     return opts
 
+
+def invalidate_ydl_opts():
+    """Drop cached option sets and pooled YoutubeDLs, e.g. after cookies change."""
+    with _ydl_bases_lock:
+        _ydl_bases.clear()
+        for platform in (None, *PLATFORMS):
+            _ydl_bases[platform] = MappingProxyType(_build_ydl_base(platform))
+    ydl_pool.invalidate()
+
+
+def _drop_ydl_bases():
+    with _ydl_bases_lock:
+        _ydl_bases.clear()
+
+
+cookie_store.on_presence_change(_drop_ydl_bases)
+
+
+# ==================== YoutubeDL Pool ====================
+# Constructing a YoutubeDL loads the extractor registry, a cookie jar (or
+# decrypts a browser's cookie DB) and the HTTP request director. Warm
+# instances are pooled per option fingerprint and leased to one job at a time;
+# the per-job keys below are applied on lease, so downloads with different
+# output paths and progress hooks still share instances.
+YDL_POOL_IDLE_MAX = int(os.environ.get('YDL_POOL_IDLE_MAX', '32'))  # idle instances kept, all option sets
+YDL_POOL_MAX_USES = int(os.environ.get('YDL_POOL_MAX_USES', '200'))  # recycle after this many leases
+_YDL_JOB_KEYS = ('outtmpl', 'progress_hooks', 'postprocessor_hooks')
+
+
+def _ydl_fingerprint(opts):
+    base = {k: v for k, v in opts.items() if k not in _YDL_JOB_KEYS}
+    return json.dumps(base, sort_keys=True, default=repr)
+
+
+def _close_ydl(ydl):
+    # YoutubeDL.close() saves its in-memory jar to 'cookiefile'; a pooled
+    # instance's jar can be older than the file, so never write it back
+    ydl.params['cookiefile'] = None
+    ydl.close()
+
+
+class YDLPool:
+    """Warm YoutubeDL instances keyed by option fingerprint, leased exclusively."""
+
+    def __init__(self, max_idle=YDL_POOL_IDLE_MAX, max_uses=YDL_POOL_MAX_USES):
+        from collections import OrderedDict
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self._idle = OrderedDict()  # fingerprint -> [(ydl, uses)], least recently returned first
+        self._lock = threading.Lock()
+        self.created = self.reused = 0
+
+    @contextmanager
+    def lease(self, opts):
+        """Borrow a YoutubeDL configured with opts for the duration of a with-block."""
+        key = _ydl_fingerprint(opts)
+        with self._lock:
+            free = self._idle.get(key)
+            ydl, uses = free.pop() if free else (None, 0)
+            if free == []:
+                del self._idle[key]
+            if ydl is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if ydl is None:
+            ydl = YoutubeDL({k: v for k, v in opts.items() if k not in _YDL_JOB_KEYS})
+        self._prepare(ydl, opts)
+        ok = False
+        try:
+            yield ydl
+            ok = True
+        finally:
+            ydl._progress_hooks = []
+            ydl._postprocessor_hooks = []
+            if ok and uses + 1 < self.max_uses:
+                self._give_back(key, ydl, uses + 1)
+            else:
+                # A failed job may leave playlist/cookie state half-updated
+                _close_ydl(ydl)
+
+    def invalidate(self):
+        """Close every idle instance (e.g. after cookies change)."""
+        with self._lock:
+            idle = [ydl for entries in self._idle.values() for ydl, _ in entries]
+            self._idle.clear()
+        for ydl in idle:
+            _close_ydl(ydl)
+
+    def stats(self):
+        with self._lock:
+            return {'idle': sum(len(v) for v in self._idle.values()), 'option_sets': len(self._idle),
+                    'created': self.created, 'reused': self.reused}
+
+    @staticmethod
+    def _prepare(ydl, opts):
+        # cookies.txt jars come from the shared cookie store; a stale one is
+        # swapped when the file has changed since this instance was seeded.
+        # Request handlers hold the jar they were built with, so the director
+        # is dropped too and rebuilt on the next request.
+        if (opts.get('cookiefile') == cookie_store.file
+                and getattr(ydl, '_cookie_generation', None) != cookie_store.generation):
+            ydl.__dict__['cookiejar'], ydl._cookie_generation = cookie_store.ydl_jar()
+            director = ydl.__dict__.pop('_request_director', None)
+            if director is not None:
+                director.close()
+        ydl.params['outtmpl'] = opts.get('outtmpl') or {}
+        ydl._parse_outtmpl()
+        ydl._progress_hooks = list(opts.get('progress_hooks') or [])
+        # Post-processors built per download (MoveFiles) pick these up
+        ydl._postprocessor_hooks = list(opts.get('postprocessor_hooks') or [])
+        ydl._num_downloads = 0
+        ydl._download_retcode = 0
+
+    def _give_back(self, key, ydl, uses):
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append((ydl, uses))
+            self._idle.move_to_end(key)
+            while sum(len(v) for v in self._idle.values()) > self.max_idle:
+                oldest = next(iter(self._idle))
+                evicted.append(self._idle[oldest].pop(0)[0])
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+        for old in evicted:
+            _close_ydl(old)
+
+
+ydl_pool = YDLPool()
+invalidate_ydl_opts()  # precompute every platform's base options at startup
+
+
 HTTP_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
     'Accept': 'application/json, text/plain, */*',
 }
 
+# ==================== Shared HTTP Client ====================
+# One pooled keep-alive client per process, so paginated API calls reuse
+# their TCP+TLS connection instead of handshaking on every page.
+try:
+    import h2  # noqa: F401 — httpx only speaks HTTP/2 when h2 is installed
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('HTTP_MAX_KEEPALIVE', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('HTTP_KEEPALIVE_EXPIRY', '60'))
+HTTP_PER_HOST_LIMIT = int(os.environ.get('HTTP_PER_HOST_LIMIT', '8'))  # concurrent requests per host, sync + async
+
+_http_client = None
+_http_client_lock = threading.Lock()
+_host_semaphores = {}
+
+
+def get_http_client():
+    """Return the process-wide pooled httpx.Client (created on first use)."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    http2=HAS_HTTP2,
+                    headers=HTTP_HEADERS,
+                    timeout=30,
+                    follow_redirects=True,
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                )
+    return _http_client
+
+
+class HostLimit:
+    """Semaphore shared by worker threads (`with`) and the async loop
+    (`async with`), so both paths together stay within one per-host cap.
+    Waiters of either kind are served in arrival order."""
+
+    def __init__(self, limit):
+        self._lock = threading.Lock()
+        self._free = limit
+        self._waiters = deque()  # threading.Event, or (loop, future) for coroutines
+
+    def acquire(self, timeout=None):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            try:
+                self._waiters.remove(event)
+                return False
+            except ValueError:
+                return True  # handed a slot just as the wait timed out
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._hand_off, future)
+
+    def _hand_off(self, future):
+        if future.done():
+            self.release()  # the waiting coroutine was cancelled meanwhile
+        else:
+            future.set_result(True)
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise  # a slot already handed over is passed on by _hand_off
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+def _host_semaphore(url):
+    """Per-host HostLimit capping concurrent requests to the same upstream."""
+    host = httpx.URL(url).host
+    sem = _host_semaphores.get(host)
+    if sem is None:
+        with _http_client_lock:
+            sem = _host_semaphores.setdefault(host, HostLimit(HTTP_PER_HOST_LIMIT))
+    return sem
+
+
+# ==================== Adaptive Rate Limiter ====================
+# Token bucket per upstream host, shared by every thread and coroutine that
+# calls it. The refill rate adapts AIMD-style: +RATE_LIMIT_STEP req/s after each
+# healthy response, x RATE_LIMIT_BACKOFF on 429/5xx, and Retry-After pauses
+# the whole host.
+RATE_LIMIT_INITIAL = float(os.environ.get('RATE_LIMIT_INITIAL', '4'))   # req/s per upstream
+RATE_LIMIT_MIN = float(os.environ.get('RATE_LIMIT_MIN', '0.2'))
+RATE_LIMIT_MAX = float(os.environ.get('RATE_LIMIT_MAX', '20'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '4'))
+RATE_LIMIT_STEP = 0.25
+RATE_LIMIT_BACKOFF = 0.5
+API_MAX_RETRIES = int(os.environ.get('API_MAX_RETRIES', '3'))  # retries on 429/5xx
+
+
+class RateLimiter:
+    """Token bucket with AIMD rate adaptation for one upstream host."""
+
+    def __init__(self, rate=RATE_LIMIT_INITIAL, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_backoff = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token; return the seconds the caller must wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return wait + max(0.0, self.paused_until - now)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(RATE_LIMIT_MAX, self.rate + RATE_LIMIT_STEP)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            # Concurrent 429s from one burst count as a single congestion signal
+            if now - self.last_backoff > 1.0 / self.rate:
+                self.rate = max(RATE_LIMIT_MIN, self.rate * RATE_LIMIT_BACKOFF)
+                self.last_backoff = now
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def feedback(self, response):
+        """Adapt the rate from an upstream response."""
+        if response.status_code == 429 or response.status_code >= 500:
+            self.on_throttle(_parse_retry_after(response.headers.get('Retry-After')))
+        else:
+            self.on_success()
+
+    def stats(self):
+        return {'rate': round(self.rate, 2), 'tokens': round(self.tokens, 2),
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 1)}
+
+
+_rate_limiters = {}
+
+
+def get_rate_limiter(url):
+    """Return the shared RateLimiter for the URL's host."""
+    host = httpx.URL(url).host
+    limiter = _rate_limiters.get(host)
+    if limiter is None:
+        with _http_client_lock:
+            limiter = _rate_limiters.setdefault(host, RateLimiter())
+    return limiter
+
+
+def _parse_retry_after(value):
+    """Retry-After header (delta-seconds or HTTP date) -> seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _should_retry(response):
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def http_get(url, params=None, headers=None, timeout=None):
+    """GET through the shared pooled client, paced by the host's rate limiter
+    and respecting the per-host concurrency cap."""
+    kwargs = {'params': params or None, 'headers': headers}
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+    limiter = get_rate_limiter(url)
+    wait = limiter.reserve()
+    if wait > 0:
+        time.sleep(wait)
+    with _host_semaphore(url):
+        r = get_http_client().get(url, **kwargs)
+    limiter.feedback(r)
+    return r
+
+
+# Async counterpart: a single event loop on a daemon thread owns one pooled
+# httpx.AsyncClient. Grabber threads submit coroutines to it via run_async().
+ASYNC_PAGE_PREFETCH = int(os.environ.get('ASYNC_PAGE_PREFETCH', '4'))  # pages fetched concurrently
+
+_async_loop = None
+_async_client = None
+
+
+def _get_async_loop():
+    """Return the background asyncio loop, starting its thread on first use."""
+    global _async_loop
+    if _async_loop is None:
+        with _http_client_lock:
+            if _async_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-http', daemon=True).start()
+                _async_loop = loop
+    return _async_loop
+
+
+def run_async(coro, timeout=None):
+    """Run a coroutine on the background loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_async_loop()).result(timeout)
+
+
+def get_async_http_client():
+    """Return the pooled httpx.AsyncClient (must be called on the background loop)."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            http2=HAS_HTTP2,
+            headers=HTTP_HEADERS,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _async_client
+
+
+async def http_get_async(url, params=None, headers=None, timeout=None):
+    """Async GET through the shared AsyncClient, respecting the per-host cap
+    (the same slots as http_get)."""
+    kwargs = {'params': params or None, 'headers': headers}
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+    limiter = get_rate_limiter(url)
+    wait = limiter.reserve()
+    if wait > 0:
+        await asyncio.sleep(wait)
+    async with _host_semaphore(url):
+        r = await get_async_http_client().get(url, **kwargs)
+    limiter.feedback(r)
+    return r
+
+
 # ==================== Progress Hook ====================
 def progress_hook(d, task_id):
     if d['status'] == 'downloading':
@@ -551,17 +1822,300 @@ def progress_hook(d, task_id):
     elif d['status'] == 'finished':
         download_progress[task_id] = {'status': 'processing', 'percent': 100, 'speed': 0, 'eta': 0}
 
+
+# ==================== Output Files ====================
+# Where a yt-dlp job's file ended up, keyed by task ID. The path comes from
+# postprocessor_hooks: the last post-processor to finish (MoveFiles, after any
+# merge or audio extraction) reports the final 'filepath', so completions
+# never have to scan DOWNLOAD_FOLDER for a name containing the task ID.
+class OutputIndex:
+    """task ID -> final output path reported by yt-dlp."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}
+
+    def hook(self, task_id):
+        """A postprocessor hook recording task_id's output path."""
+        def on_postprocess(d):
+            path = (d.get('info_dict') or {}).get('filepath')
+            if d.get('status') == 'finished' and path:
+                with self._lock:
+                    self._paths[task_id] = path
+        return on_postprocess
+
+    def pop(self, task_id, default=None):
+        """Take the recorded path (entries don't outlive their job)."""
+        with self._lock:
+            return self._paths.pop(task_id, default)
+
+
+output_index = OutputIndex()
+
+
+# ==================== Streaming Downloads ====================
+# Direct-URL media (photos, no-watermark originals, Sora files) is streamed to
+# '<dest>.part' in fixed-size chunks and renamed into place only once complete,
+# so memory stays bounded per download and readers never see partial files.
+# On a dropped connection the .part file is kept and the transfer resumes with
+# a Range request, guarded by If-Range so a changed upstream file restarts
+# from zero instead of being spliced.
+# Large files can optionally be fetched as SEGMENTED_CONNECTIONS parallel byte
+# ranges written in place into a preallocated .part file, which sidesteps
+# per-connection CDN throttling. Servers that don't advertise Accept-Ranges
+# get the single stream.
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', str(256 * 1024)))
+STREAM_PROGRESS_INTERVAL = 0.25  # seconds between progress callbacks
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', '4'))
+DOWNLOAD_RETRY_BACKOFF = float(os.environ.get('DOWNLOAD_RETRY_BACKOFF', '1'))  # seconds, doubled per retry
+SEGMENTED_CONNECTIONS = int(os.environ.get('SEGMENTED_CONNECTIONS', '4'))
+SEGMENTED_MIN_SIZE = int(os.environ.get('SEGMENTED_MIN_SIZE', str(8 * 1024 * 1024)))  # bytes
+
+
+class DownloadError(IOError):
+    """Direct download failed; retryable tells stream_download whether to try again."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def stream_progress(task_id):
+    """Progress callback writing byte-level progress into download_progress[task_id]."""
+    def report(downloaded, total, speed):
+        download_progress[task_id] = {
+            'status': 'downloading',
+            'percent': round(downloaded / total * 100, 1) if total else 0,
+            'speed': speed,
+            'eta': round((total - downloaded) / speed) if total and speed else 0,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+        }
+    return report
+
+
+@contextmanager
+def _open_stream(url, headers, timeout, impersonate, host_limit=True):
+    """Yield (status, headers, chunk iterator) for a streamed GET.
+    host_limit=False leaves the per-host slot to the caller (see stream mode)."""
+    if impersonate and HAS_CURL_CFFI:
+        session = cffi_requests.Session(impersonate='chrome110')
+        r = session.get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            yield r.status_code, r.headers, r.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        finally:
+            r.close()
+            session.close()
+        return
+    limiter = get_rate_limiter(url)
+    wait = limiter.reserve()
+    if wait > 0:
+        time.sleep(wait)
+    with _host_semaphore(url) if host_limit else nullcontext():
+        with get_http_client().stream('GET', url, headers=headers, timeout=timeout) as r:
+            limiter.feedback(r)
+            yield r.status_code, r.headers, r.iter_bytes(STREAM_CHUNK_SIZE)
+
+
+def _range_total(content_range):
+    """'bytes 100-199/1000' -> (100, 1000); total is 0 when unknown ('*')."""
+    m = re.match(r'bytes (\d+)-\d+/(\d+|\*)', content_range or '')
+    if not m:
+        return None, 0
+    return int(m.group(1)), int(m.group(2)) if m.group(2) != '*' else 0
+
+
+def _validator(headers):
+    """Strong ETag, else Last-Modified — usable as an If-Range value."""
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def _retry_delay(attempt):
+    return min(DOWNLOAD_RETRY_BACKOFF * 2 ** attempt, 30)
+
+
+def _probe_ranges(url, headers, timeout, impersonate):
+    """Return (total, validator) if the server serves byte ranges, else None."""
+    req_headers = dict(headers or {}, Range='bytes=0-0')
+    req_headers['Accept-Encoding'] = 'identity'
+    with _open_stream(url, req_headers, timeout, impersonate) as (status, resp_headers, chunks):
+        # A 206 with a Content-Range is proof enough (many CDNs omit
+        # Accept-Ranges). Anything else, e.g. a 200 carrying the whole file,
+        # is closed unread so the fallback doesn't fetch it twice.
+        start, total = _range_total(resp_headers.get('Content-Range')) if status == 206 else (None, 0)
+        if start != 0 or not total:
+            return None
+        for _ in chunks:  # the single byte; lets the connection be reused
+            pass
+        return total, _validator(resp_headers)
+
+
+def _download_segment(url, headers, timeout, impersonate, part, start, end, validator, tick, cancel):
+    """Fetch bytes start..end (inclusive) into part at their offset, resuming on errors."""
+    pos = start
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        req_headers = dict(headers or {}, Range=f'bytes={pos}-{end}')
+        req_headers['Accept-Encoding'] = 'identity'
+        if validator:
+            req_headers['If-Range'] = validator
+        try:
+            with _open_stream(url, req_headers, timeout, impersonate) as (status, resp_headers, chunks):
+                if status != 206 or _range_total(resp_headers.get('Content-Range'))[0] != pos:
+                    # 200 here means If-Range failed: the file changed under us
+                    raise DownloadError(f'Segment {start}-{end}: HTTP {status}',
+                                        retryable=status == 429 or status >= 500)
+                with open(part, 'r+b') as f:
+                    f.seek(pos)
+                    for chunk in chunks:
+                        if cancel.is_set():
+                            return
+                        chunk = chunk[:end + 1 - pos]
+                        f.write(chunk)
+                        pos += len(chunk)
+                        tick(len(chunk))
+                        if pos > end:
+                            return
+            raise DownloadError(f'Segment {start}-{end} ended early at {pos}')
+        except (DownloadError, httpx.TransportError, OSError) as e:
+            if cancel.is_set() or not getattr(e, 'retryable', True) or attempt == DOWNLOAD_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt))
+
+
+def _segmented_download(url, dest, headers, timeout, progress, impersonate, total, validator):
+    part = dest + '.part'
+    seg_size = -(-total // SEGMENTED_CONNECTIONS)
+    ranges = [(start, min(start + seg_size, total) - 1) for start in range(0, total, seg_size)]
+    state = {'done': 0, 'last': 0}
+    lock = threading.Lock()
+    cancel = threading.Event()
+    started = time.time()
+
+    def tick(n):
+        with lock:
+            state['done'] += n
+            now = time.time()
+            if progress and now - state['last'] >= STREAM_PROGRESS_INTERVAL:
+                state['last'] = now
+                progress(state['done'], total, round(state['done'] / max(now - started, 1e-3)))
+
+    try:
+        with open(part, 'wb') as f:
+            f.truncate(total)  # preallocate so every segment can write in place
+        with ThreadPoolExecutor(len(ranges), thread_name_prefix='segment') as pool:
+            futures = [pool.submit(_download_segment, url, headers, timeout, impersonate,
+                                   part, start, end, validator, tick, cancel)
+                       for start, end in ranges]
+            try:
+                for fut in futures:
+                    fut.result()
+            except BaseException:
+                cancel.set()
+                raise
+        if state['done'] != total or os.path.getsize(part) != total:
+            raise DownloadError(f'Segmented download incomplete: {state["done"]}/{total} bytes')
+        os.replace(part, dest)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    if progress:
+        progress(total, total, round(total / max(time.time() - started, 1e-3)))
+    return total
+
+
+def stream_download(url, dest, headers=None, timeout=60, progress=None, impersonate=False, segmented=False):
+    """Stream url to dest atomically, resuming across retries. Returns bytes written.
+
+    progress(downloaded, total, speed) is called periodically if given.
+    impersonate=True uses curl_cffi (browser TLS fingerprint) when available.
+    segmented=True splits files of SEGMENTED_MIN_SIZE+ bytes across parallel
+    range requests when the server supports it.
+    """
+    if segmented and SEGMENTED_CONNECTIONS > 1:
+        try:
+            probe = _probe_ranges(url, headers, timeout, impersonate)
+            if probe and probe[0] >= SEGMENTED_MIN_SIZE:
+                return _segmented_download(url, dest, headers, timeout, progress, impersonate, *probe)
+        except (DownloadError, httpx.TransportError, OSError) as e:
+            logging.warning(f'Segmented download of {url} failed ({e}); using a single stream')
+
+    part = dest + '.part'
+    validator, total = None, 0
+    started = time.time()
+    try:
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            offset = os.path.getsize(part) if os.path.exists(part) and validator else 0
+            req_headers = dict(headers or {})
+            req_headers['Accept-Encoding'] = 'identity'  # byte offsets must match the file
+            if offset:
+                req_headers['Range'] = f'bytes={offset}-'
+                req_headers['If-Range'] = validator
+            try:
+                with _open_stream(url, req_headers, timeout, impersonate) as (status, resp_headers, chunks):
+                    if status == 416 and offset and offset == total:
+                        break  # everything was already on disk
+                    if status >= 400:
+                        raise DownloadError(f'HTTP {status}', retryable=status == 429 or status >= 500)
+                    if status == 206:
+                        start, total = _range_total(resp_headers.get('Content-Range'))
+                        if start != offset:
+                            os.remove(part)
+                            raise DownloadError(f'Unexpected Content-Range {resp_headers.get("Content-Range")}')
+                    else:
+                        # Full body: fresh download, or the file changed and If-Range failed
+                        offset = 0
+                        total = int(resp_headers.get('Content-Length') or 0)
+                        validator = _validator(resp_headers)
+                    _write_chunks(chunks, part, offset, total, started, progress)
+                size = os.path.getsize(part)
+                if total and size != total:
+                    raise DownloadError(f'Incomplete download: {size}/{total} bytes')
+                break
+            except (DownloadError, httpx.TransportError, OSError) as e:
+                if not getattr(e, 'retryable', True) or attempt == DOWNLOAD_RETRIES:
+                    raise
+                delay = _retry_delay(attempt)
+                logging.info(f'Download of {url} interrupted ({e}); resuming in {delay:.0f}s')
+                time.sleep(delay)
+        os.replace(part, dest)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    size = os.path.getsize(dest)
+    if progress:
+        progress(size, total or size, round(size / max(time.time() - started, 1e-3)))
+    return size
+
+
+def _write_chunks(chunks, part, offset, total, started, progress):
+    downloaded = offset
+    last = 0
+    with open(part, 'ab' if offset else 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            downloaded += len(chunk)
+            now = time.time()
+            if progress and now - last >= STREAM_PROGRESS_INTERVAL:
+                last = now
+                progress(downloaded, total, round(downloaded / max(now - started, 1e-3)))
+
 # ==================== TikTok/Douyin API Helpers (TikHub API v1) ====================
 def api_request(endpoint, params=None):
     """Generic GET request to the TikHub API (api.tikhub.io)."""
     try:
-        headers = dict(HTTP_HEADERS)
-        if TIKHUB_API_KEY:
-            headers['Authorization'] = f'Bearer {TIKHUB_API_KEY}'
-        with httpx.Client(headers=headers, timeout=30, follow_redirects=True) as c:
-            r = c.get(f"{API_BASE_URL}{endpoint}", params=params or {})
-            if r.status_code == 200:
-                return r.json()
+        headers = {'Authorization': f'Bearer {TIKHUB_API_KEY}'} if TIKHUB_API_KEY else None
+        for _ in range(API_MAX_RETRIES + 1):
+            # The rate limiter has already slowed the host down on a 429/5xx
+            r = http_get(f"{API_BASE_URL}{endpoint}", params=params, headers=headers)
+            if not _should_retry(r):
+                break
+        if r.status_code == 200:
+            return r.json()
     except Exception:
         pass
     return None
@@ -792,6 +2346,76 @@ def api_ig_get_user_highlights(user_id):
     return api_request("/api/v1/instagram/app/get_user_highlights", {"user_id": str(user_id)})
 
 
+# ==================== Async TikHub API Layer ====================
+# Coroutine versions of the helpers above, for grabbers that can issue
+# independent calls (profile info + first page, offset-paginated pages) at once.
+async def api_request_async(endpoint, params=None):
+    """Async GET request to the TikHub API; same contract as api_request."""
+    try:
+        headers = {'Authorization': f'Bearer {TIKHUB_API_KEY}'} if TIKHUB_API_KEY else None
+        for _ in range(API_MAX_RETRIES + 1):
+            r = await http_get_async(f"{API_BASE_URL}{endpoint}", params=params, headers=headers)
+            if not _should_retry(r):
+                break
+        if r.status_code == 200:
+            return r.json()
+    except Exception:
+        pass
+    return None
+
+
+def api_gather(*coros):
+    """Run independent API coroutines concurrently from a (sync) grabber thread.
+    Returns results in order; a call that raised yields None."""
+    async def _all():
+        return await asyncio.gather(*coros, return_exceptions=True)
+    return [None if isinstance(r, BaseException) else r for r in run_async(_all())]
+
+
+def api_fetch_pages(fetch_page, pages):
+    """Fetch several offset-paginated pages concurrently: fetch_page(n) -> coroutine."""
+    return api_gather(*(fetch_page(pg) for pg in pages))
+
+
+async def api_get_douyin_user_profile_async(sec_user_id):
+    return await api_request_async("/api/v1/douyin/web/handler_user_profile", {'sec_user_id': sec_user_id})
+
+async def api_get_douyin_user_posts_async(sec_user_id, max_cursor=0, count=20):
+    return await api_request_async("/api/v1/douyin/web/fetch_user_post_videos",
+                                   {'sec_user_id': sec_user_id, 'max_cursor': max_cursor, 'count': count})
+
+async def api_xhs_get_user_info_async(user_id):
+    return await api_request_async("/api/v1/xiaohongshu/web/get_user_info", {"user_id": user_id})
+
+async def api_xhs_get_user_posts_async(user_id, cursor=''):
+    p = {'user_id': user_id}
+    if cursor:
+        p['cursor'] = cursor
+    return await api_request_async("/api/v1/xiaohongshu/web/get_user_posts", p)
+
+async def api_bili_get_user_info_async(uid):
+    return await api_request_async("/api/v1/bilibili/web/get_user_info", {"uid": str(uid)})
+
+async def api_bili_get_user_videos_async(uid, page=1, page_size=30):
+    return await api_request_async("/api/v1/bilibili/web/get_user_videos",
+                                   {'uid': str(uid), 'page': page, 'page_size': page_size})
+
+async def api_weibo_get_user_info_async(uid):
+    return await api_request_async("/api/v1/weibo/web/get_user_info", {"uid": str(uid)})
+
+async def api_weibo_get_user_posts_async(uid, page=1):
+    return await api_request_async("/api/v1/weibo/web/get_user_posts", {'uid': str(uid), 'page': page})
+
+async def api_kuaishou_get_user_info_async(user_id):
+    return await api_request_async("/api/v1/kuaishou/web/get_user_info", {"user_id": user_id})
+
+async def api_kuaishou_get_user_posts_async(user_id, cursor=''):
+    p = {'user_id': user_id}
+    if cursor:
+        p['cursor'] = cursor
+    return await api_request_async("/api/v1/kuaishou/web/get_user_posts", p)
+
+
 def extract_instagram_api_item(item):
     """Convert Instagram API item (Web or App) to unified format."""
     try:
@@ -1080,7 +2704,7 @@ def grab_tiktok_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយកវីដេអូ...'})
 
-        videos, cursor, has_more, page = [], 0, True, 0
+        videos, cursor, has_more, page = _live_videos(task), 0, True, 0
         while has_more:
             page += 1
             task['message'] = f'ទំព័រ {page}... ({len(videos)} វីដេអូ)'
@@ -1099,7 +2723,6 @@ def grab_tiktok_profile(url, task_id, max_videos=0):
             has_more = has_more and data.get('hasMore', data.get('has_more', False))
             cursor = data.get('cursor', 0)
             if not cursor or not has_more: break
-            time.sleep(1.5)
 
         task.update({'status': 'completed', 'videos': videos, 'total': len(videos),
                      'message': f'រកឃើញ {len(videos)} វីដេអូ'})
@@ -1126,7 +2749,9 @@ def grab_douyin_profile(url, task_id, max_videos=0):
 
         profile_info = _default_profile('Douyin User', sid)
         profile_info['platform'] = 'douyin'
-        pr = api_get_douyin_user_profile(sid)
+        # Profile info and the first posts page only need sid — fetch both at once
+        pr, first_page = api_gather(api_get_douyin_user_profile_async(sid),
+                                    api_get_douyin_user_posts_async(sid, max_cursor=0, count=20))
         if pr and pr.get('code') == 200:
             pd = pr.get('data', {}).get('user', {})
             profile_info.update({
@@ -1143,11 +2768,11 @@ def grab_douyin_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយកវីដេអូ...'})
 
-        videos, max_cursor, has_more, page = [], 0, True, 0
+        videos, max_cursor, has_more, page = _live_videos(task), 0, True, 0
         while has_more:
             page += 1
             task['message'] = f'ទំព័រ {page}... ({len(videos)} វីដេអូ)'
-            resp = api_get_douyin_user_posts(sid, max_cursor=max_cursor, count=20)
+            resp = first_page if page == 1 else api_get_douyin_user_posts(sid, max_cursor=max_cursor, count=20)
             if not resp or resp.get('code') != 200: break
             data = resp.get('data', {})
             items = data.get('aweme_list', [])
@@ -1162,7 +2787,6 @@ def grab_douyin_profile(url, task_id, max_videos=0):
             has_more = has_more and data.get('has_more', False)
             max_cursor = data.get('max_cursor', data.get('cursor', 0))
             if not has_more: break
-            time.sleep(1.5)
 
         task.update({'status': 'completed', 'videos': videos, 'total': len(videos),
                      'message': f'រកឃើញ {len(videos)} វីដេអូ'})
@@ -1315,8 +2939,7 @@ def _grab_facebook_via_graph(username, url, token, task_id, max_videos=0):
     task['profile'] = profile_info
 
     # Fetch ALL content with pagination (videos + reels + photos)
-    items = []
-    seen_ids = set()
+    items = _live_videos(task)
     video_count = 0
     photo_count = 0
     task.update({'status': 'grabbing', 'message': 'កំពុងទាញយកទិន្នន័យតាម Graph API...'})
@@ -1335,12 +2958,10 @@ def _grab_facebook_via_graph(username, url, token, task_id, max_videos=0):
         if not data:
             break
         for item in data:
-            if item.get('id') in seen_ids:
+            if items.has(item.get('id')):
                 continue
             v = _extract_fb_graph_video(item, page_name, 'video')
-            if v:
-                seen_ids.add(v['id'])
-                items.append(v)
+            if v and items.append(v):
                 video_count += 1
                 _update_msg()
                 if 0 < max_videos <= len(items):
@@ -1363,12 +2984,10 @@ def _grab_facebook_via_graph(username, url, token, task_id, max_videos=0):
             if not data:
                 break
             for item in data:
-                if item.get('id') in seen_ids:
+                if items.has(item.get('id')):
                     continue
                 v = _extract_fb_graph_video(item, page_name, 'reel')
-                if v:
-                    seen_ids.add(v['id'])
-                    items.append(v)
+                if v and items.append(v):
                     video_count += 1
                     _update_msg()
                     if 0 < max_videos <= len(items):
@@ -1413,12 +3032,10 @@ def _grab_facebook_via_graph(username, url, token, task_id, max_videos=0):
                 if not data:
                     break
                 for item in data:
-                    if item.get('id') in seen_ids:
+                    if items.has(item.get('id')):
                         continue
                     p = _extract_fb_graph_photo(item, page_name)
-                    if p:
-                        seen_ids.add(p['id'])
-                        items.append(p)
+                    if p and items.append(p):
                         photo_count += 1
                         _update_msg()
                         if 0 < max_videos <= len(items):
@@ -1443,12 +3060,10 @@ def _grab_facebook_via_graph(username, url, token, task_id, max_videos=0):
                 if not data:
                     break
                 for item in data:
-                    if item.get('id') in seen_ids:
+                    if items.has(item.get('id')):
                         continue
                     p = _extract_fb_graph_photo(item, page_name)
-                    if p:
-                        seen_ids.add(p['id'])
-                        items.append(p)
+                    if p and items.append(p):
                         photo_count += 1
                         _update_msg()
                         if 0 < max_videos <= len(items):
@@ -1549,7 +3164,7 @@ def grab_facebook_profile(url, task_id, max_videos=0):
             # Try yt-dlp with cookies (cookies.txt or browser)
             for attempt_opts in _facebook_ydl_attempts(grab_url, max_videos):
                 try:
-                    with YoutubeDL(attempt_opts) as ydl:
+                    with ydl_pool.lease(attempt_opts) as ydl:
                         info = ydl.extract_info(grab_url, download=False)
                     if info:
                         entries = []
@@ -1572,7 +3187,7 @@ def grab_facebook_profile(url, task_id, max_videos=0):
                                     'following': 0, 'likes': 0,
                                     'video_count': len(entries),
                                 }
-                            videos = []
+                            videos = _live_videos(task)
                             for e in entries:
                                 v = extract_ytdlp_entry(e, 'facebook')
                                 if v:
@@ -1595,7 +3210,7 @@ def grab_facebook_profile(url, task_id, max_videos=0):
             task['profile'] = profile_info
             task.update({'status': 'grabbing', 'message': f'កំពុងដំណើរការ {len(video_urls)} វីដេអូ...'})
 
-            videos = []
+            videos = _live_videos(task)
             limit = max_videos if max_videos > 0 else len(video_urls)
             for i, vurl in enumerate(video_urls[:limit]):
                 vid_id = re.search(r'v=(\d+)', vurl)
@@ -1613,7 +3228,7 @@ def grab_facebook_profile(url, task_id, max_videos=0):
                 # Try to get more info via yt-dlp for each video
                 try:
                     opts = get_ydl_opts('facebook', {'socket_timeout': 10})
-                    with YoutubeDL(opts) as ydl:
+                    with ydl_pool.lease(opts) as ydl:
                         vinfo = ydl.extract_info(vurl, download=False)
                     if vinfo:
                         v['title'] = vinfo.get('title', v['title'])
@@ -1763,7 +3378,7 @@ def grab_instagram_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយក Posts...'})
 
-        videos = []
+        videos = _live_videos(task)
         page = 0
 
         # --- Grab Posts via App API (primary) ---
@@ -1795,7 +3410,6 @@ def grab_instagram_profile(url, task_id, max_videos=0):
                     max_id = data.get('next_max_id', '')
                     if not max_id:
                         break
-                    time.sleep(1.5)
                 except Exception as ex:
                     logging.warning(f'Instagram App posts page {page} error: {ex}')
                     break
@@ -1849,7 +3463,6 @@ def grab_instagram_profile(url, task_id, max_videos=0):
                                     break
                     if not end_cursor:
                         break
-                    time.sleep(1.5)
                 except Exception as ex:
                     logging.warning(f'Instagram Web posts page {page} error: {ex}')
                     break
@@ -1885,7 +3498,6 @@ def grab_instagram_profile(url, task_id, max_videos=0):
                     reel_max_id = data.get('paging_info', {}).get('max_id', data.get('next_max_id', ''))
                     if not reel_max_id:
                         break
-                    time.sleep(1.5)
             except Exception as ex:
                 logging.warning(f'Instagram Reels error: {ex}')
 
@@ -1920,7 +3532,7 @@ def _grab_instagram_ytdlp_fallback(url, username, task_id, max_videos, profile_i
                 'playlistend': max_videos if max_videos > 0 else None,
                 'ignoreerrors': True, 'cookiefile': cfile,
             })
-            with YoutubeDL(opts) as ydl:
+            with ydl_pool.lease(opts) as ydl:
                 info = ydl.extract_info(grab_url, download=False)
             if not (info and info.get('entries')):
                 info = None
@@ -1939,7 +3551,7 @@ def _grab_instagram_ytdlp_fallback(url, username, task_id, max_videos, profile_i
                     'ignoreerrors': True, 'cookiesfrombrowser': (browser,),
                 })
                 opts.pop('cookiefile', None)
-                with YoutubeDL(opts) as ydl:
+                with ydl_pool.lease(opts) as ydl:
                     info = ydl.extract_info(grab_url, download=False)
                 if info and info.get('entries'):
                     break
@@ -1960,7 +3572,7 @@ def _grab_instagram_ytdlp_fallback(url, username, task_id, max_videos, profile_i
             })
             opts.pop('cookiefile', None)
             opts.pop('cookiesfrombrowser', None)
-            with YoutubeDL(opts) as ydl:
+            with ydl_pool.lease(opts) as ydl:
                 info = ydl.extract_info(grab_url, download=False)
         except Exception:
             info = None
@@ -2004,7 +3616,7 @@ def _grab_instagram_ytdlp_fallback(url, username, task_id, max_videos, profile_i
     task['profile'] = profile_info
     task.update({'status': 'grabbing', 'message': f'កំពុងដំណើរការ {len(entries)} posts...'})
 
-    videos = []
+    videos = _live_videos(task)
     for e in entries:
         v = extract_ytdlp_entry(e, 'instagram')
         if v:
@@ -2032,7 +3644,8 @@ def grab_xiaohongshu_profile(url, task_id, max_videos=0):
             return grab_universal_profile(url, task_id, max_videos, 'xiaohongshu')
 
         profile_info = _default_profile(user_id, user_id)
-        resp = api_xhs_get_user_info(user_id)
+        resp, first_page = api_gather(api_xhs_get_user_info_async(user_id),
+                                      api_xhs_get_user_posts_async(user_id))
         if resp and resp.get('code') == 200:
             ud = resp.get('data', {})
             profile_info.update({
@@ -2048,11 +3661,11 @@ def grab_xiaohongshu_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយក posts...'})
 
-        videos, cursor, page = [], '', 0
+        videos, cursor, page = _live_videos(task), '', 0
         while True:
             page += 1
             task['message'] = f'ទំព័រ {page}... ({len(videos)} posts)'
-            resp = api_xhs_get_user_posts(user_id, cursor=cursor)
+            resp = first_page if page == 1 else api_xhs_get_user_posts(user_id, cursor=cursor)
             if not resp or resp.get('code') != 200: break
             data = resp.get('data', {})
             items = data.get('notes', data.get('items', []))
@@ -2066,7 +3679,6 @@ def grab_xiaohongshu_profile(url, task_id, max_videos=0):
             if 0 < max_videos <= len(videos): break
             cursor = data.get('cursor', data.get('next_cursor', ''))
             if not cursor or not data.get('has_more', False): break
-            time.sleep(1.5)
 
         if not videos:
             return grab_universal_profile(url, task_id, max_videos, 'xiaohongshu')
@@ -2076,6 +3688,18 @@ def grab_xiaohongshu_profile(url, task_id, max_videos=0):
         profile_tasks[task_id].update({'status': 'error', 'message': f'កំហុស: {e}'})
 
 
+def _bili_total_pages(data, page_size=30):
+    """Page count of a Bilibili user-videos response ('pages', or page.count / page size)."""
+    if data.get('pages'):
+        return data['pages']
+    meta = data.get('page', {})
+    if not isinstance(meta, dict):
+        return 1
+    if meta.get('count'):
+        return -(-meta['count'] // (meta.get('ps') or page_size))
+    return meta.get('pn', 1)
+
+
 def grab_bilibili_profile(url, task_id, max_videos=0):
     """哔哩哔哩 (Bilibili) Profile Grabber via TikHub API."""
     task = profile_tasks[task_id]
@@ -2089,7 +3713,8 @@ def grab_bilibili_profile(url, task_id, max_videos=0):
             return grab_universal_profile(url, task_id, max_videos, 'bilibili')
 
         profile_info = _default_profile(uid, uid)
-        resp = api_bili_get_user_info(uid)
+        resp, first_page = api_gather(api_bili_get_user_info_async(uid),
+                                      api_bili_get_user_videos_async(uid, page=1, page_size=30))
         if resp and resp.get('code') == 200:
             ud = resp.get('data', {})
             profile_info.update({
@@ -2105,10 +3730,12 @@ def grab_bilibili_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយកវីដេអូ...'})
 
-        videos, pg = [], 1
-        while True:
+        # Pages are offset-based, so once page 1 tells us the page count the
+        # following pages are fetched ASYNC_PAGE_PREFETCH at a time.
+        videos, pg, pending = _live_videos(task), 1, [first_page]
+        while pending:
             task['message'] = f'ទំព័រ {pg}... ({len(videos)} វីដេអូ)'
-            resp = api_bili_get_user_videos(uid, page=pg, page_size=30)
+            resp = pending.pop(0)
             if not resp or resp.get('code') != 200: break
             data = resp.get('data', {})
             vlist = data.get('vlist', data.get('list', data.get('items', [])))
@@ -2120,10 +3747,13 @@ def grab_bilibili_profile(url, task_id, max_videos=0):
                     task['total'] = len(videos)
                     if 0 < max_videos <= len(videos): break
             if 0 < max_videos <= len(videos): break
-            total_pages = data.get('pages', data.get('page', {}).get('pn', 1))
+            total_pages = _bili_total_pages(data)
             if pg >= total_pages: break
             pg += 1
-            time.sleep(1.5)
+            if not pending:
+                last = min(total_pages, pg + ASYNC_PAGE_PREFETCH - 1)
+                pending = api_fetch_pages(lambda n: api_bili_get_user_videos_async(uid, page=n, page_size=30),
+                                          range(pg, last + 1))
 
         if not videos:
             return grab_universal_profile(url, task_id, max_videos, 'bilibili')
@@ -2146,7 +3776,8 @@ def grab_weibo_profile(url, task_id, max_videos=0):
             return grab_universal_profile(url, task_id, max_videos, 'weibo')
 
         profile_info = _default_profile(uid, uid)
-        resp = api_weibo_get_user_info(uid)
+        resp, first_page = api_gather(api_weibo_get_user_info_async(uid),
+                                      api_weibo_get_user_posts_async(uid, page=1))
         if resp and resp.get('code') == 200:
             ud = resp.get('data', {})
             profile_info.update({
@@ -2162,10 +3793,12 @@ def grab_weibo_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយក posts...'})
 
-        videos, pg = [], 1
-        while True:
+        # Weibo doesn't report a page count: prefetch ASYNC_PAGE_PREFETCH pages
+        # at a time and stop at the first empty one.
+        videos, pg, pending = _live_videos(task), 1, [first_page]
+        while pending:
             task['message'] = f'ទំព័រ {pg}... ({len(videos)} posts)'
-            resp = api_weibo_get_user_posts(uid, page=pg)
+            resp = pending.pop(0)
             if not resp or resp.get('code') != 200: break
             data = resp.get('data', {})
             items = data.get('statuses', data.get('list', data.get('cards', [])))
@@ -2179,7 +3812,9 @@ def grab_weibo_profile(url, task_id, max_videos=0):
             if 0 < max_videos <= len(videos): break
             pg += 1
             if pg > 50: break
-            time.sleep(1.5)
+            if not pending:
+                pending = api_fetch_pages(lambda n: api_weibo_get_user_posts_async(uid, page=n),
+                                          range(pg, min(pg + ASYNC_PAGE_PREFETCH, 51)))
 
         if not videos:
             return grab_universal_profile(url, task_id, max_videos, 'weibo')
@@ -2221,7 +3856,7 @@ def grab_twitter_profile(url, task_id, max_videos=0):
 
         if user_id:
             task.update({'status': 'grabbing', 'message': 'កំពុងទាញយក tweets...'})
-            videos, cursor, page = [], '', 0
+            videos, cursor, page = _live_videos(task), '', 0
             while True:
                 page += 1
                 task['message'] = f'ទំព័រ {page}... ({len(videos)} tweets)'
@@ -2239,7 +3874,6 @@ def grab_twitter_profile(url, task_id, max_videos=0):
                 if 0 < max_videos <= len(videos): break
                 cursor = data.get('cursor', data.get('next_cursor', ''))
                 if not cursor: break
-                time.sleep(1.5)
 
             if videos:
                 task.update({'status': 'completed', 'videos': videos, 'total': len(videos),
@@ -2288,7 +3922,7 @@ def grab_threads_profile(url, task_id, max_videos=0):
 
         if user_id:
             task.update({'status': 'grabbing', 'message': 'កំពុងទាញយក posts...'})
-            videos, max_id, page = [], '', 0
+            videos, max_id, page = _live_videos(task), '', 0
             while True:
                 page += 1
                 task['message'] = f'ទំព័រ {page}... ({len(videos)} posts)'
@@ -2331,7 +3965,6 @@ def grab_threads_profile(url, task_id, max_videos=0):
                 if 0 < max_videos <= len(videos): break
                 max_id = data.get('next_max_id', data.get('cursor', ''))
                 if not max_id: break
-                time.sleep(1.5)
 
             if videos:
                 task.update({'status': 'completed', 'videos': videos, 'total': len(videos),
@@ -2356,7 +3989,8 @@ def grab_kuaishou_profile(url, task_id, max_videos=0):
             return grab_universal_profile(url, task_id, max_videos, 'kuaishou')
 
         profile_info = _default_profile(user_id, user_id)
-        resp = api_kuaishou_get_user_info(user_id)
+        resp, first_page = api_gather(api_kuaishou_get_user_info_async(user_id),
+                                      api_kuaishou_get_user_posts_async(user_id))
         if resp and resp.get('code') == 200:
             ud = resp.get('data', {})
             profile_info.update({
@@ -2372,11 +4006,11 @@ def grab_kuaishou_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយកវីដេអូ...'})
 
-        videos, cursor, page = [], '', 0
+        videos, cursor, page = _live_videos(task), '', 0
         while True:
             page += 1
             task['message'] = f'ទំព័រ {page}... ({len(videos)} វីដេអូ)'
-            resp = api_kuaishou_get_user_posts(user_id, cursor=cursor)
+            resp = first_page if page == 1 else api_kuaishou_get_user_posts(user_id, cursor=cursor)
             if not resp or resp.get('code') != 200: break
             data = resp.get('data', {})
             items = data.get('feeds', data.get('photos', data.get('list', [])))
@@ -2402,7 +4036,6 @@ def grab_kuaishou_profile(url, task_id, max_videos=0):
             if 0 < max_videos <= len(videos): break
             cursor = data.get('cursor', data.get('pcursor', ''))
             if not cursor: break
-            time.sleep(1.5)
 
         if not videos:
             return grab_universal_profile(url, task_id, max_videos, 'kuaishou')
@@ -2428,7 +4061,7 @@ def grab_reddit_profile(url, task_id, max_videos=0):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': 'កំពុងទាញយក posts...'})
 
-        videos, after, page = [], '', 0
+        videos, after, page = _live_videos(task), '', 0
         while True:
             page += 1
             task['message'] = f'ទំព័រ {page}... ({len(videos)} posts)'
@@ -2463,7 +4096,6 @@ def grab_reddit_profile(url, task_id, max_videos=0):
             if 0 < max_videos <= len(videos): break
             after = data.get('after', '')
             if not after: break
-            time.sleep(1.5)
 
         if not videos:
             return grab_universal_profile(url, task_id, max_videos, 'reddit')
@@ -2493,7 +4125,7 @@ def grab_universal_profile(url, task_id, max_videos=0, platform=''):
         })
 
         task['message'] = f'កំពុងស្កេន {pname}...'
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             info = ydl.extract_info(grab_url, download=False)
 
         if not info:
@@ -2530,7 +4162,7 @@ def grab_universal_profile(url, task_id, max_videos=0, platform=''):
         task['profile'] = profile_info
         task.update({'status': 'grabbing', 'message': f'កំពុងដំណើរការ {len(entries)} posts...'})
 
-        videos = []
+        videos = _live_videos(task)
         for e in entries:
             v = extract_ytdlp_entry(e, platform)
             if v:
@@ -2552,7 +4184,7 @@ def _grab_ytdlp_fallback(url, task_id, max_videos, platform, username, profile_i
     try:
         opts = get_ydl_opts(platform, {'extract_flat': 'in_playlist',
                                         'playlistend': max_videos if max_videos > 0 else None})
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             info = ydl.extract_info(url, download=False)
         if info and info.get('entries'):
             entries = list(info['entries'])
@@ -2584,7 +4216,7 @@ def extract_comments_for_url(url, platform=None):
             'getcomments': True,
             'extractor_args': {'youtube': {'comment_sort': ['top'], 'max_comments': ['100,20,20,5']}},
         })
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             info = ydl.extract_info(url, download=False)
         comments = info.get('comments', [])
         return [{
@@ -2631,10 +4263,10 @@ def search_videos_ydl(query, platform='youtube', count=20, search_type='keyword'
         if platform == 'twitter':
             extra['extract_flat'] = False
         opts = get_ydl_opts(platform, extra)
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             info = ydl.extract_info(search_url, download=False)
         entries = info.get('entries', []) if info else []
-        results = []
+        results = MediaList(platform)
         for e in entries:
             if e:
                 v = extract_ytdlp_entry(e, platform)
@@ -2653,7 +4285,7 @@ def _search_facebook(query, count=20, search_type='keyword'):
     token = _load_fb_token()
     if not token:
         return []
-    results = []
+    results = MediaList('facebook')
     try:
         # Search public pages/posts related to query
         if search_type == 'hashtag':
@@ -2704,9 +4336,8 @@ def _search_facebook(query, count=20, search_type='keyword'):
                 'limit': min(count - len(results), 20),
             }, token)
             if vid_search and 'data' in vid_search:
-                seen = {r.get('id') for r in results}
                 for vid in vid_search['data']:
-                    if vid.get('id') not in seen:
+                    if not results.has(vid.get('id')):
                         v = _extract_fb_graph_video(vid)
                         if v:
                             v['author'] = vid.get('from', {}).get('name', '')
@@ -2720,7 +4351,7 @@ def _search_facebook(query, count=20, search_type='keyword'):
 
 def _search_tiktok(query, count=20, search_type='keyword'):
     """Search TikTok via TikHub hybrid API first, then yt-dlp fallback."""
-    results = []
+    results = MediaList('tiktok')
 
     # Try Evil0ctal hybrid API for hashtag search
     if search_type == 'hashtag':
@@ -2747,16 +4378,14 @@ def _search_tiktok(query, count=20, search_type='keyword'):
         else:
             search_url = f'https://www.tiktok.com/search?q={query}'
         opts = get_ydl_opts('tiktok', {'extract_flat': True, 'playlistend': count})
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             info = ydl.extract_info(search_url, download=False)
         entries = info.get('entries', []) if info else []
         for e in entries:
             if e:
                 v = extract_ytdlp_entry(e, 'tiktok')
                 if v:
-                    # Avoid duplicates from hybrid results
-                    if not any(r.get('id') == v.get('id') for r in results):
-                        results.append(v)
+                    results.append(v)  # duplicates of hybrid results are dropped
                     if len(results) >= count:
                         break
         return results
@@ -2770,10 +4399,10 @@ def _search_pinterest(query, count=20):
     try:
         search_url = f'https://www.pinterest.com/search/pins/?q={query}'
         opts = get_ydl_opts('pinterest', {'extract_flat': True, 'playlistend': count})
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             info = ydl.extract_info(search_url, download=False)
         entries = info.get('entries', []) if info else []
-        results = []
+        results = MediaList('pinterest')
         for e in entries:
             if e:
                 v = extract_ytdlp_entry(e, 'pinterest')
@@ -2787,6 +4416,723 @@ def _search_pinterest(query, count=20):
         return []
 
 
+# ==================== Metadata Cache ====================
+# /api/info results keyed by (platform, canonical video ID): an in-memory LRU
+# in front of a SQLite table, so repeat lookups survive restarts too.
+METADATA_CACHE_DB = os.environ.get('METADATA_CACHE_DB',
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metadata_cache.db'))
+METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE', '1000'))  # in-memory entries
+METADATA_CACHE_TTL = {  # seconds; capped by the earliest expiry of any signed URL in the payload
+    'tiktok': 1800, 'douyin': 1800, 'instagram': 1800, 'xiaohongshu': 1800, 'kuaishou': 1800,
+    'youtube': 6 * 3600, 'bilibili': 3600,
+}
+METADATA_CACHE_DEFAULT_TTL = 3600
+
+
+class MetadataCache:
+    """Two-tier TTL cache: in-memory LRU backed by a SQLite table."""
+
+    def __init__(self, path, max_items=METADATA_CACHE_SIZE):
+        from collections import OrderedDict
+        self.max_items = max_items
+        self._mem = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self._writes = 0
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS metadata '
+                             '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            self._db.execute('DELETE FROM metadata WHERE expires_at < ?', (time.time(),))
+            self._db.commit()
+        except Exception as e:
+            logging.warning(f'Metadata cache: SQLite tier disabled ({e})')
+            self._db = None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry and entry[0] > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._mem[key]
+            row = None
+            if self._db is not None:
+                try:
+                    row = self._db.execute('SELECT value, expires_at FROM metadata WHERE key = ?', (key,)).fetchone()
+                except Exception:
+                    row = None
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl):
+        # Signed CDN URLs (e.g. TikTok nwm_url) must not outlive their expiry
+        expires_at = min(time.time() + ttl, _payload_url_expiry(value) - SIGNED_URL_MARGIN)
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is None:
+                return
+            try:
+                self._db.execute('INSERT OR REPLACE INTO metadata (key, value, expires_at) VALUES (?, ?, ?)',
+                                 (key, json.dumps(value, ensure_ascii=False), expires_at))
+                self._writes += 1
+                if self._writes % 500 == 0:
+                    self._db.execute('DELETE FROM metadata WHERE expires_at < ?', (time.time(),))
+                self._db.commit()
+            except Exception as e:
+                logging.warning(f'Metadata cache write failed: {e}')
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None. Returns rows removed."""
+        with self._lock:
+            if key is None:
+                removed = len(self._mem)
+                self._mem.clear()
+            else:
+                removed = 1 if self._mem.pop(key, None) else 0
+            if self._db is not None:
+                try:
+                    if key is None:
+                        cur = self._db.execute('DELETE FROM metadata')
+                    else:
+                        cur = self._db.execute('DELETE FROM metadata WHERE key = ?', (key,))
+                    self._db.commit()
+                    removed = max(removed, cur.rowcount)
+                except Exception:
+                    pass
+            return removed
+
+    def stats(self):
+        with self._lock:
+            disk = 0
+            if self._db is not None:
+                try:
+                    disk = self._db.execute('SELECT COUNT(*) FROM metadata').fetchone()[0]
+                except Exception:
+                    pass
+            return {'memory_entries': len(self._mem), 'disk_entries': disk,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def _remember(self, key, expires_at, value):
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+
+metadata_cache = MetadataCache(METADATA_CACHE_DB)
+
+
+# Full yt-dlp info dicts from /api/info, kept briefly so the /api/download
+# that usually follows can skip re-extraction. In memory only: signed format
+# URLs expire within hours anyway.
+RESOLVED_INFO_TTL = int(os.environ.get('RESOLVED_INFO_TTL', '900'))
+RESOLVED_INFO_MAX = int(os.environ.get('RESOLVED_INFO_MAX', '100'))
+SIGNED_URL_MARGIN = 60  # treat URLs expiring within this many seconds as expired
+
+_resolved_infos = {}  # cache key -> (expires_at, sanitized info dict)
+_resolved_infos_lock = threading.Lock()
+
+
+def remember_resolved_info(key, info):
+    """Keep an extracted info dict for RESOLVED_INFO_TTL seconds under `key`."""
+    info = YoutubeDL.sanitize_info(info, remove_private_keys=True)
+    with _resolved_infos_lock:
+        _resolved_infos.pop(key, None)
+        _resolved_infos[key] = (time.time() + RESOLVED_INFO_TTL, info)
+        while len(_resolved_infos) > RESOLVED_INFO_MAX:
+            _resolved_infos.pop(next(iter(_resolved_infos)))
+    return key
+
+
+def get_resolved_info(key):
+    """Return a private copy of a remembered info dict whose signed URLs are still valid."""
+    with _resolved_infos_lock:
+        entry = _resolved_infos.get(key)
+        if not entry:
+            return None
+        if entry[0] < time.time() or _info_urls_expired(entry[1]):
+            del _resolved_infos[key]
+            return None
+        return copy.deepcopy(entry[1])
+
+
+_SIGNED_EXPIRY_PATTERNS = (
+    (re.compile(r'[?&/]expire[=/](\d{9,11})'), 10),        # YouTube (query or path form)
+    (re.compile(r'[?&]x-expires=(\d{9,11})'), 10),          # TikTok / Douyin CDN
+    (re.compile(r'[?&](?:Expires|se)=(\d{9,11})\b'), 10),   # CloudFront / Azure SAS
+    (re.compile(r'[?&]oe=([0-9A-Fa-f]{8})\b'), 16),          # Instagram / Facebook CDN
+)
+
+
+def _url_expiry(url):
+    """Unix time a signed URL stops working, or None if it carries no expiry."""
+    for pattern, base in _SIGNED_EXPIRY_PATTERNS:
+        m = pattern.search(url)
+        if m:
+            return int(m.group(1), base)
+    return None
+
+
+def _payload_url_expiry(value):
+    """Earliest signed-URL expiry anywhere in a JSON-like payload (inf if none)."""
+    if isinstance(value, str):
+        expiry = _url_expiry(value) if value.startswith('http') else None
+        return expiry if expiry is not None else float('inf')
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, (list, tuple)):
+        return float('inf')
+    return min(map(_payload_url_expiry, value), default=float('inf'))
+
+
+def _info_urls_expired(info, margin=SIGNED_URL_MARGIN):
+    """True if any signed format URL in the info dict expires within `margin` seconds."""
+    deadline = time.time() + margin
+    for f in (info.get('formats') or [info]):
+        expiry = _url_expiry(f.get('url') or '')
+        if expiry is not None and expiry < deadline:
+            return True
+    return False
+
+
+def ydl_download_with_info(ydl, url, info=None):
+    """Download from an already-extracted info dict when we have one, else from the URL.
+    Mirrors YoutubeDL.download_with_info_file: re-extracts if the stored info fails."""
+    if info:
+        try:
+            ydl.process_ie_result(info, download=True)
+            return
+        except Exception as e:
+            logging.warning(f'Download from cached info failed ({e}); re-extracting {url}')
+    ydl.download([url])
+
+
+def metadata_cache_key(url, platform=None):
+    """Canonical cache key: 'platform:video_id', or the normalized URL if no ID is found."""
+    platform = platform or detect_platform(url) or ''
+    key = media_key(platform, url=url)
+    if key:
+        return f'{key[0]}:{key[1]}'
+    # Only scheme and host are case-insensitive; short-link codes in the path
+    # (vm.tiktok.com/ZM..., b23.tv, pin.it, fb.watch) are not
+    parts = urlsplit(url.strip())
+    norm = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+    return f'{platform}:url:{norm}'
+
+
+# ==================== Job Scheduler ====================
+# Background work runs on bounded worker pools instead of one raw thread per
+# request: 'network' for extraction, grabs and downloads, 'cpu' for FFmpeg.
+# Each pool has a priority queue; when it is full, submit() raises
+# QueueFullError and the route answers 429 with the queue position.
+# A few network workers only take PRIORITY_HIGH jobs, so interactive
+# downloads still start while long grabs and batches hold the rest.
+NETWORK_WORKERS = int(os.environ.get('NETWORK_WORKERS', '8'))
+NETWORK_RESERVED_WORKERS = int(os.environ.get('NETWORK_RESERVED_WORKERS', '2'))  # high-priority only
+NETWORK_QUEUE_SIZE = int(os.environ.get('NETWORK_QUEUE_SIZE', '200'))
+CPU_WORKERS = int(os.environ.get('CPU_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+CPU_QUEUE_SIZE = int(os.environ.get('CPU_QUEUE_SIZE', '50'))
+
+PRIORITY_HIGH = 0     # interactive single downloads
+PRIORITY_NORMAL = 5   # profile grabs, conversions
+PRIORITY_LOW = 10     # bulk batches
+
+
+class QueueFullError(Exception):
+    """Raised by JobPool.submit when the pool's queue is saturated."""
+
+    def __init__(self, pool, position, job_id=None):
+        super().__init__(f'{pool} queue is full')
+        self.pool = pool
+        self.position = position
+        self.job_id = job_id
+
+
+class JobPool:
+    """Fixed set of worker threads draining a bounded priority queue. The
+    first `reserved` workers only run PRIORITY_HIGH jobs."""
+
+    def __init__(self, name, workers, max_queue, reserved=0):
+        self.name = name
+        self.workers = workers
+        self.reserved = max(0, min(reserved, workers - 1))
+        self.max_queue = max_queue
+        self._queue = []  # heap of (priority, seq, job_id, fn, args, kwargs)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.running = 0
+        self.completed = self.failed = self.rejected = 0
+        for i in range(workers):
+            threading.Thread(target=self._work, args=(i < self.reserved,), name=f'{name}-worker-{i}',
+                             daemon=True).start()
+
+    def submit(self, fn, *args, priority=PRIORITY_NORMAL, job_id=None, **kwargs):
+        """Queue fn(*args, **kwargs). Returns the job's queue position (0 = starts now)."""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(self.name, len(self._queue) + 1, job_id)
+            entry = (priority, next(self._seq), job_id, fn, args, kwargs)
+            heapq.heappush(self._queue, entry)
+            # Wake everyone: a reserved worker may not be allowed to take it
+            self._cond.notify_all()
+            idle = self.workers - self.running
+            ahead = sum(1 for e in self._queue if e[:2] < entry[:2])
+            return 0 if ahead < idle else ahead - idle + 1
+
+    def position(self, job_id):
+        """1-based position of a queued job, or 0 if it is running / unknown."""
+        with self._cond:
+            ordered = sorted(self._queue)
+            return next((i + 1 for i, e in enumerate(ordered) if e[2] == job_id), 0)
+
+    def stats(self):
+        with self._cond:
+            return {'workers': self.workers, 'reserved': self.reserved, 'running': self.running,
+                    'queued': len(self._queue),
+                    'max_queue': self.max_queue, 'completed': self.completed,
+                    'failed': self.failed, 'rejected': self.rejected}
+
+    def _work(self, high_only=False):
+        while True:
+            with self._cond:
+                while not self._queue or (high_only and self._queue[0][0] > PRIORITY_HIGH):
+                    self._cond.wait()
+                _, _, job_id, fn, args, kwargs = heapq.heappop(self._queue)
+                self.running += 1
+            try:
+                fn(*args, **kwargs)
+                ok = True
+            except Exception:
+                logging.error(f'{self.name} job {job_id} crashed:\n{traceback.format_exc()}')
+                ok = False
+            with self._cond:
+                self.running -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+
+job_pools = {
+    'network': JobPool('network', NETWORK_WORKERS, NETWORK_QUEUE_SIZE, reserved=NETWORK_RESERVED_WORKERS),
+    'cpu': JobPool('cpu', CPU_WORKERS, CPU_QUEUE_SIZE),
+}
+
+
+def submit_job(pool, fn, *args, priority=PRIORITY_NORMAL, job_id=None, **kwargs):
+    """Queue a background job on the named pool; see JobPool.submit."""
+    return job_pools[pool].submit(fn, *args, priority=priority, job_id=job_id, **kwargs)
+
+
+# Fan-out for /api/profile/download-all. A batch occupies one network-pool
+# worker as coordinator and runs its items on executors shared by every
+# batch, so items never wait behind their own coordinator in the shared queue
+# and the total number of batch fetches stays bounded however many batches
+# run. Each batch keeps at most BATCH_*_CONCURRENCY items queued or running
+# there, so concurrent batches interleave instead of queueing behind each other.
+BATCH_VIDEO_WORKERS = int(os.environ.get('BATCH_VIDEO_WORKERS', '4'))           # yt-dlp downloads, all batches
+BATCH_PHOTO_WORKERS = int(os.environ.get('BATCH_PHOTO_WORKERS', '8'))           # photo fetches, all batches
+BATCH_VIDEO_CONCURRENCY = int(os.environ.get('BATCH_VIDEO_CONCURRENCY', '3'))   # parallel yt-dlp downloads per batch
+BATCH_PHOTO_CONCURRENCY = int(os.environ.get('BATCH_PHOTO_CONCURRENCY', '6'))   # parallel photo fetches per batch
+BATCH_PER_HOST_LIMIT = int(os.environ.get('BATCH_PER_HOST_LIMIT', '3'))         # yt-dlp downloads per site
+_batch_host_semaphores = {}
+_batch_host_lock = threading.Lock()
+batch_video_pool = ThreadPoolExecutor(BATCH_VIDEO_WORKERS, thread_name_prefix='batch-video')
+batch_photo_pool = ThreadPoolExecutor(BATCH_PHOTO_WORKERS, thread_name_prefix='batch-photo')
+
+
+def _batch_host_semaphore(url):
+    """Caps concurrent yt-dlp downloads per site across all running batches."""
+    host = httpx.URL(url).host
+    with _batch_host_lock:
+        return _batch_host_semaphores.setdefault(host, threading.BoundedSemaphore(BATCH_PER_HOST_LIMIT))
+
+
+# ==================== Media Serving ====================
+# Finished files go out with byte-range support (seeking in <video>, resumable
+# downloads via If-Range) and a strong ETag built from size + mtime, so
+# If-None-Match revalidation answers 304 without reading the file. Werkzeug
+# hands the open file to the server's wsgi.file_wrapper (sendfile(2) under
+# gunicorn / uWSGI). Behind a front-end server MEDIA_SENDFILE takes the
+# transfer out of Python entirely:
+#   'x-accel'    X-Accel-Redirect to MEDIA_ACCEL_PREFIX + the path relative to
+#                DOWNLOAD_FOLDER (an nginx `internal` location aliasing it)
+#   'x-sendfile' X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '').lower()
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-downloads/')
+
+
+def media_path(*parts):
+    """Absolute path of an existing file under DOWNLOAD_FOLDER, or None
+    (missing, or the name tries to escape the folder)."""
+    path = safe_join(DOWNLOAD_FOLDER, *parts)
+    return path if path and os.path.isfile(path) else None
+
+
+def send_media(path, download_name=None):
+    """Serve a downloaded file as an attachment; see the section comment."""
+    st = os.stat(path)
+    mark_accessed(path, st)
+    etag = f'{st.st_size:x}-{st.st_mtime_ns:x}'
+    name = download_name or os.path.basename(path)
+    rel = os.path.relpath(path, DOWNLOAD_FOLDER)
+    if MEDIA_SENDFILE not in ('x-accel', 'x-sendfile') or rel.startswith('..'):
+        return send_file(path, as_attachment=True, download_name=name, conditional=True, etag=etag)
+
+    resp = Response(mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+    resp.set_etag(etag)
+    resp.last_modified = st.st_mtime
+    if request.if_none_match.contains(etag):
+        resp.status_code = 304
+        return resp
+    # Same quoting as send_file: Headers.set escapes quotes and backslashes
+    try:
+        name.encode('ascii')
+        disposition = {'filename': name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        disposition = {'filename': simple, 'filename*': f"UTF-8''{url_quote(name, safe='!#$&+^`|')}"}
+    resp.headers.set('Content-Disposition', 'attachment', **disposition)
+    if MEDIA_SENDFILE == 'x-accel':
+        # nginx serves the bytes, Range requests included
+        resp.headers['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + url_quote(rel.replace(os.sep, '/'))
+    else:
+        resp.headers['X-Sendfile'] = path
+    return resp
+
+
+# ==================== Batch Bundles ====================
+# A finished batch (download-all or Sora bulk) can be fetched as one archive
+# that is generated on the fly while it is sent: no temp archive, no extra
+# disk. Media is stored, not re-compressed, so every byte of the archive is
+# known from file sizes alone and Content-Length is exact up front.
+# ZIP entries use data descriptors (the CRC is computed while streaming) and
+# switch to ZIP64 fields only where a size, offset or entry count overflows.
+BUNDLE_READ_SIZE = 1024 * 1024
+_U32, _U16 = 0xFFFFFFFF, 0xFFFF
+
+
+def _dos_datetime(mtime):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1  # 1980-01-01 00:00
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def _read_exact(path, size):
+    """Yield exactly `size` bytes of path; the length was promised in advance."""
+    left = size
+    with open(path, 'rb') as f:
+        while left:
+            chunk = f.read(min(BUNDLE_READ_SIZE, left))
+            if not chunk:
+                raise IOError(f'{path} shrank while bundling')
+            left -= len(chunk)
+            yield chunk
+
+
+def zip_stream(entries):
+    """(content_length, chunk generator) for a stored ZIP of [(arcname, path)]."""
+    plan, offset = [], 0
+    for arcname, path in entries:
+        st = os.stat(path)
+        name = arcname.encode('utf-8')
+        big = st.st_size >= _U32
+        local = 30 + len(name) + (20 if big else 0)
+        plan.append((name, path, st.st_size, st.st_mtime, offset, big))
+        offset += local + st.st_size + (24 if big else 16)
+    cd_start = offset
+    cd_size = 0
+    for name, _, size, _, entry_offset, big in plan:
+        extra = (16 if big else 0) + (8 if entry_offset >= _U32 else 0)
+        cd_size += 46 + len(name) + (4 + extra if extra else 0)
+    zip64 = len(plan) >= _U16 or cd_start >= _U32 or cd_size >= _U32
+    length = cd_start + cd_size + (56 + 20 if zip64 else 0) + 22
+
+    def generate():
+        crcs = []
+        for name, path, size, mtime, _, big in plan:
+            dtime, ddate = _dos_datetime(mtime)
+            # flags: bit 3 = sizes/CRC in the data descriptor, bit 11 = UTF-8 name
+            head = struct.pack('<IHHHHHIIIHH', 0x04034B50, 45 if big else 20, 0x0808, 0, dtime, ddate,
+                               0, _U32 if big else 0, _U32 if big else 0, len(name), 20 if big else 0)
+            yield head + name + (struct.pack('<HHQQ', 1, 16, 0, 0) if big else b'')
+            crc = 0
+            for chunk in _read_exact(path, size):
+                crc = zlib.crc32(chunk, crc)
+                yield chunk
+            crcs.append(crc)
+            yield (struct.pack('<IIQQ', 0x08074B50, crc, size, size) if big
+                   else struct.pack('<IIII', 0x08074B50, crc, size, size))
+        central = []
+        for (name, _, size, mtime, entry_offset, big), crc in zip(plan, crcs):
+            dtime, ddate = _dos_datetime(mtime)
+            extra = (struct.pack('<QQ', size, size) if big else b'') + \
+                    (struct.pack('<Q', entry_offset) if entry_offset >= _U32 else b'')
+            if extra:
+                extra = struct.pack('<HH', 1, len(extra)) + extra
+            central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014B50, 45, 45 if extra else 20, 0x0808, 0,
+                                       dtime, ddate, crc, _U32 if big else size, _U32 if big else size,
+                                       len(name), len(extra), 0, 0, 0, 0,
+                                       min(entry_offset, _U32)) + name + extra)
+        yield b''.join(central)
+        count = len(plan)
+        if zip64:
+            yield struct.pack('<IQHHIIQQQQ', 0x06064B50, 44, 45, 45, 0, 0, count, count, cd_size, cd_start)
+            yield struct.pack('<IIQI', 0x07064B50, 0, cd_start + cd_size, 1)
+        yield struct.pack('<IHHHHIIH', 0x06054B50, 0, 0, min(count, _U16), min(count, _U16),
+                          min(cd_size, _U32), min(cd_start, _U32), 0)
+
+    return length, generate()
+
+
+def tar_stream(entries):
+    """(content_length, chunk generator) for a POSIX (pax) tar of [(arcname, path)]."""
+    plan, length = [], 1024  # two zero blocks end the archive
+    for arcname, path in entries:
+        st = os.stat(path)
+        info = tarfile.TarInfo(arcname)
+        info.size, info.mtime, info.mode = st.st_size, int(st.st_mtime), 0o644
+        header = info.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8')
+        pad = -st.st_size % 512
+        plan.append((header, path, st.st_size, pad))
+        length += len(header) + st.st_size + pad
+
+    def generate():
+        for header, path, size, pad in plan:
+            yield header
+            yield from _read_exact(path, size)
+            if pad:
+                yield b'\0' * pad
+        yield b'\0' * 1024
+
+    return length, generate()
+
+
+def _bundle_entries(task_id):
+    """[(arcname, path)] of a batch's finished files, or None if there's no such batch."""
+    task = download_progress.snapshot(task_id)
+    if task and 'files' in task:
+        paths = [media_path(f) for f in task.get('files') or []]
+    else:
+        task = sora_tasks.snapshot(task_id)
+        if not task:
+            return None
+        paths = [media_path(r.get('output_dir', ''), r.get('clean_file', ''))
+                 for r in task.get('results') or [] if r.get('success')]
+    entries, names = [], set()
+    for path in dict.fromkeys(filter(None, paths)):
+        name = base = os.path.basename(path)
+        n = 1
+        while name in names:
+            stem, ext = os.path.splitext(base)
+            name, n = f'{stem}_{n}{ext}', n + 1
+        names.add(name)
+        entries.append((name, path))
+    return entries
+
+
+# ==================== Disk Janitor ====================
+# Keeps the app's own files in DOWNLOAD_FOLDER within DISK_QUOTA bytes. The
+# folder may be the user's personal Downloads, so only files the app created
+# are candidates: top-level names it generates (<platform>_..., batch_...,
+# wm_..., sora_input_..., each carrying an 8-hex task ID), content store blobs
+# and sora_output_<id>/ directories. Every JANITOR_INTERVAL seconds it groups
+# those by inode, so an alias and its blob count once, and removes:
+#   - intermediates (wm_input_*, wm_upload_*, sora_input_*, *_converted_*,
+#     partial downloads) not accessed for DISK_TEMP_MAX_AGE seconds
+#   - anything not accessed for DISK_MAX_AGE seconds
+#   - least recently accessed files while they total more than DISK_QUOTA
+# Last access is the newer of atime and mtime; serving a file or reusing it
+# from the content store bumps atime explicitly (see mark_accessed), so
+# noatime/relatime mounts don't matter. Files named after a task that is still
+# in memory (running or recently finished) or referenced by one are never
+# touched. Every limit defaults to 0 (off); the janitor thread only starts
+# once one of them is set.
+DISK_QUOTA = int(os.environ.get('DISK_QUOTA', '0'))                      # bytes
+DISK_MAX_AGE = int(os.environ.get('DISK_MAX_AGE', '0'))                  # seconds since last access
+DISK_TEMP_MAX_AGE = int(os.environ.get('DISK_TEMP_MAX_AGE', '0'))        # seconds, intermediates only
+JANITOR_INTERVAL = int(os.environ.get('JANITOR_INTERVAL', '300'))        # seconds between sweeps
+_APP_FILE_RE = re.compile(r'^(?:%s|video|batch|wm_input|wm_upload|wm_clean|sora_input)_(?:.*_)?[0-9a-f]{8}(?=[_.]|$)'
+                          % '|'.join(map(re.escape, PLATFORMS)))
+_APP_DIR_RE = re.compile(r'^sora_output_[0-9a-f]{8}$')
+_TEMP_FILE_RE = re.compile(r'^(wm_input_|wm_upload_|sora_input_)|_converted_|\.(part|ytdl|link)$|\.part-Frag\d+$')
+_NAME_TOKEN_RE = re.compile(r'[_./\\-]')
+
+
+def mark_accessed(path, st=None):
+    """Record a read of path for the janitor's LRU order (mtime is kept)."""
+    try:
+        st = st or os.stat(path)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except OSError:
+        pass
+
+
+class DiskJanitor:
+    """Background sweeper for DOWNLOAD_FOLDER; see the section comment."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # one sweep at a time
+        self._thread = None
+        self._stats = {'runs': 0, 'last_run': None, 'last_duration': 0, 'files': 0, 'bytes': 0,
+                       'protected': 0, 'evicted_files': 0, 'evicted_bytes': 0, 'errors': 0}
+
+    def start(self):
+        if self._thread is None and (DISK_QUOTA or DISK_MAX_AGE or DISK_TEMP_MAX_AGE):
+            self._thread = threading.Thread(target=self._run, name='disk-janitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(JANITOR_INTERVAL)
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.warning(f'Disk janitor sweep failed: {e}')
+
+    @staticmethod
+    def _live_refs():
+        """(IDs of tasks held in memory, every file or directory name their state mentions)"""
+        ids, names = set(), set()
+
+        def collect(value):
+            if isinstance(value, str):
+                if value and len(value) < 512:
+                    names.add(value)
+                    names.add(os.path.basename(value))
+            elif isinstance(value, dict):
+                for v in value.values():
+                    collect(v)
+            elif isinstance(value, (list, tuple)):
+                for v in value:
+                    collect(v)
+
+        for store in (download_progress, watermark_tasks, sora_tasks):
+            for task_id in list(dict.keys(store)):
+                ids.add(task_id)
+                collect(store.snapshot(task_id, {}))
+        names.discard('')
+        return ids, names
+
+    @staticmethod
+    def _app_files(folder):
+        """(path, name) of every file the app created under folder."""
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    if _APP_FILE_RE.match(entry.name):
+                        yield entry.path, entry.name
+                elif entry.is_dir(follow_symlinks=False) and (
+                        entry.name == CONTENT_STORE_DIR or _APP_DIR_RE.match(entry.name)):
+                    for root, _dirs, names in os.walk(entry.path):
+                        for name in names:
+                            yield os.path.join(root, name), name
+
+    def _scan(self, folder, ids, refs):
+        """(dev, ino) -> [paths, size, last access, protected, all names temporary]"""
+        files = {}
+        for path, name in self._app_files(folder):
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            rel = os.path.relpath(path, folder)
+            entry = files.setdefault((st.st_dev, st.st_ino), [[], st.st_size, 0, False, True])
+            entry[0].append(path)
+            entry[2] = max(entry[2], st.st_atime, st.st_mtime)
+            # Task IDs appear inside names (wm_input_<id>.mp4, sora_output_<id>/...)
+            entry[3] = (entry[3] or not ids.isdisjoint(_NAME_TOKEN_RE.split(rel))
+                        or not refs.isdisjoint(rel.split(os.sep)))
+            entry[4] = entry[4] and bool(_TEMP_FILE_RE.search(name))
+        return files
+
+    def sweep(self):
+        """Run one pass now; returns the stats."""
+        with self._lock:
+            started = time.time()
+            folder = DOWNLOAD_FOLDER
+            ids, refs = self._live_refs()
+            files = self._scan(folder, ids, refs) if os.path.isdir(folder) else {}
+            total = sum(f[1] for f in files.values())
+            victims, kept = [], []
+            for entry in files.values():
+                paths, size, last, protected, temp = entry
+                limit = DISK_TEMP_MAX_AGE if temp else DISK_MAX_AGE
+                if protected:
+                    continue
+                if limit and started - last > limit:
+                    victims.append(entry)
+                    total -= size
+                else:
+                    kept.append(entry)
+            if DISK_QUOTA and total > DISK_QUOTA:
+                for entry in sorted(kept, key=lambda e: e[2]):
+                    if total <= DISK_QUOTA:
+                        break
+                    victims.append(entry)
+                    total -= entry[1]
+
+            evicted = freed = errors = 0
+            for paths, size, *_ in victims:
+                removed = content_store.remove(paths)
+                evicted += removed
+                freed += size if removed == len(paths) else 0
+                errors += len(paths) - removed
+            self._prune_dirs(folder, ids)
+            if victims:
+                logging.info(f'Disk janitor: removed {evicted} files, {freed} bytes from {folder}')
+            s = self._stats
+            s.update(runs=s['runs'] + 1, last_run=started, last_duration=round(time.time() - started, 3),
+                     files=sum(len(f[0]) for f in files.values()) - evicted, bytes=total,
+                     protected=sum(1 for f in files.values() if f[3]),
+                     evicted_files=s['evicted_files'] + evicted, evicted_bytes=s['evicted_bytes'] + freed,
+                     errors=s['errors'] + errors)
+            return self.stats()
+
+    @staticmethod
+    def _prune_dirs(folder, ids):
+        # Emptied sora_output_<id>/ of finished tasks; store shards are pruned
+        # by the content store itself, under the lock ingest() links with
+        try:
+            with os.scandir(folder) as entries:
+                dirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)
+                        and _APP_DIR_RE.match(e.name) and e.name.rsplit('_', 1)[1] not in ids]
+        except OSError:
+            dirs = []
+        for path in dirs:
+            try:
+                os.rmdir(path)  # only succeeds when empty
+            except OSError:
+                pass
+        content_store.prune_shards()
+
+    def stats(self):
+        return dict(self._stats, folder=DOWNLOAD_FOLDER, quota=DISK_QUOTA, max_age=DISK_MAX_AGE,
+                    temp_max_age=DISK_TEMP_MAX_AGE, interval=JANITOR_INTERVAL,
+                    running=self._thread is not None)
+
+
+disk_janitor = DiskJanitor()
+disk_janitor.start()
+
+
 # ==================== Flask Routes ====================
 
 # Global error handlers — always return JSON for API routes
@@ -2808,6 +5154,16 @@ def method_not_allowed(e):
         return jsonify({'error': 'Method not allowed'}), 405
     return render_template('index.html'), 405
 
+@app.errorhandler(QueueFullError)
+def queue_full(e):
+    # The route registered its task before submitting — drop the orphan
+    for store in (download_progress, profile_tasks, watermark_tasks, sora_tasks):
+        store.pop(e.job_id, None)
+    resp = jsonify({'error': 'ម៉ាស៊ីនមេរវល់ពេក សូមព្យាយាមម្តងទៀត', 'queue': e.pool,
+                    'queue_position': e.position, 'retry_after': 10})
+    resp.headers['Retry-After'] = '10'
+    return resp, 429
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -2829,6 +5185,28 @@ def get_video_info():
     if not platform:
         return jsonify({'error': 'URL មិនត្រឹមត្រូវ។ គាំទ្រ TikTok, Douyin, YouTube, Instagram, Facebook, X, Pinterest, Xiaohongshu, Bilibili, Reddit, Weibo, Threads, LinkedIn...'}), 400
 
+    cache_key = metadata_cache_key(url, platform)
+    if not data.get('refresh'):
+        cached = metadata_cache.get(cache_key)
+        if cached is not None:
+            return jsonify({**cached, 'url': url, 'cached': True, **_info_token(cache_key)})
+
+    try:
+        info = _resolve_video_info(url, platform)
+    except Exception as e:
+        return jsonify({'error': f'កំហុស: {e}'}), 500
+    metadata_cache.set(cache_key, info, METADATA_CACHE_TTL.get(platform, METADATA_CACHE_DEFAULT_TTL))
+    return jsonify({**info, **_info_token(cache_key)})
+
+
+def _info_token(cache_key):
+    """{'info_token': ...} when /api/download can reuse the extracted info, else {}."""
+    with _resolved_infos_lock:
+        return {'info_token': cache_key} if cache_key in _resolved_infos else {}
+
+
+def _resolve_video_info(url, platform):
+    """Build the /api/info payload: TikHub hybrid API first, then yt-dlp."""
     # --- Try TikHub Hybrid API first for TikTok / Douyin / Xiaohongshu / Bilibili ---
     if platform in ('tiktok', 'douyin', 'xiaohongshu', 'bilibili'):
         try:
@@ -2869,7 +5247,7 @@ def get_video_info():
                 if isinstance(dur, (int, float)) and dur > 10000:
                     dur = dur // 1000  # ms → s for Douyin
 
-                return jsonify({
+                return {
                     'title': (title or 'Video')[:200],
                     'description': (hd.get('desc', '') or '')[:500],
                     'thumbnail': thumb,
@@ -2888,50 +5266,178 @@ def get_video_info():
                     'is_photo': not dur,
                     'nwm_url': nwm_url,
                     'api_source': 'tikhub',
-                })
+                }
         except Exception:
             pass  # Fallback to yt-dlp below
 
     # --- yt-dlp fallback for all platforms ---
-    try:
-        opts = get_ydl_opts(platform, {'extract_flat': False})
-        with YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+    opts = get_ydl_opts(platform, {'extract_flat': False})
+    with ydl_pool.lease(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    remember_resolved_info(metadata_cache_key(url, platform), info)
+
+    formats = []
+    if info.get('formats'):
+        for f in info['formats']:
+            fmt = {
+                'format_id': f.get('format_id', ''), 'ext': f.get('ext', 'mp4'),
+                'resolution': f.get('resolution', 'N/A'), 'filesize': f.get('filesize', 0),
+                'has_video': f.get('vcodec', 'none') != 'none',
+                'has_audio': f.get('acodec', 'none') != 'none',
+                'quality': f.get('quality', 0), 'format_note': f.get('format_note', ''),
+            }
+            if fmt['has_video']:
+                formats.append(fmt)
 
-        formats = []
-        if info.get('formats'):
-            for f in info['formats']:
-                fmt = {
-                    'format_id': f.get('format_id', ''), 'ext': f.get('ext', 'mp4'),
-                    'resolution': f.get('resolution', 'N/A'), 'filesize': f.get('filesize', 0),
-                    'has_video': f.get('vcodec', 'none') != 'none',
-                    'has_audio': f.get('acodec', 'none') != 'none',
-                    'quality': f.get('quality', 0), 'format_note': f.get('format_note', ''),
-                }
-                if fmt['has_video']:
-                    formats.append(fmt)
+    thumb = info.get('thumbnail', '')
+    if not thumb and info.get('thumbnails'):
+        thumb = info['thumbnails'][-1].get('url', '')
 
-        thumb = info.get('thumbnail', '')
-        if not thumb and info.get('thumbnails'):
-            thumb = info['thumbnails'][-1].get('url', '')
+    return {
+        'title': info.get('title', 'Video'), 'description': (info.get('description', '') or '')[:500],
+        'thumbnail': thumb, 'duration': info.get('duration', 0),
+        'author': info.get('uploader', info.get('creator', info.get('channel', 'Unknown'))),
+        'view_count': info.get('view_count', 0), 'like_count': info.get('like_count', 0),
+        'comment_count': info.get('comment_count', 0), 'formats': formats,
+        'url': url, 'platform': platform,
+        'upload_date': info.get('upload_date', ''),
+        'is_photo': not info.get('duration'),
+    }
 
-        return jsonify({
-            'title': info.get('title', 'Video'), 'description': (info.get('description', '') or '')[:500],
-            'thumbnail': thumb, 'duration': info.get('duration', 0),
-            'author': info.get('uploader', info.get('creator', info.get('channel', 'Unknown'))),
-            'view_count': info.get('view_count', 0), 'like_count': info.get('like_count', 0),
-            'comment_count': info.get('comment_count', 0), 'formats': formats,
-            'url': url, 'platform': platform,
-            'upload_date': info.get('upload_date', ''),
-            'is_photo': not info.get('duration'),
-        })
+
+# Stream mode (/api/download?stream=1): when the request maps to one
+# progressive HTTP file (no merge, no audio extraction) the bytes are relayed
+# to the client as they arrive instead of landing in DOWNLOAD_FOLDER first.
+# tee=1 also writes a copy there, finishing as a normal task and file.
+# A relay is paced by the client and can stay open for as long as a browser
+# keeps it paused, so it takes a slot from its own per-host limit instead of
+# HTTP_PER_HOST_LIMIT; when none frees up within STREAM_SLOT_TIMEOUT the
+# request gets 503 and can retry or download normally.
+STREAM_PER_HOST_LIMIT = int(os.environ.get('STREAM_PER_HOST_LIMIT', '8'))
+STREAM_SLOT_TIMEOUT = float(os.environ.get('STREAM_SLOT_TIMEOUT', '10'))  # seconds
+_stream_host_limits = {}
+_STREAM_HEIGHTS = {'360p': 360, '480p': 480, '720p': 720, '1080p': 1080, '1440p': 1440, '4k': 2160}
+_STREAM_DIRECT = '[protocol^=http][protocol!*=dash]'  # one plain HTTP(S) file, no fragments
+
+
+def _stream_slot(url):
+    host = httpx.URL(url).host
+    with _http_client_lock:
+        return _stream_host_limits.setdefault(host, HostLimit(STREAM_PER_HOST_LIMIT))
+
+
+def _stream_format(quality):
+    """Format spec that only ever selects a single directly fetchable file."""
+    height = _STREAM_HEIGHTS.get(quality)
+    spec = f'best[height<={height}][ext=mp4]{_STREAM_DIRECT}/best[height<={height}]{_STREAM_DIRECT}/' if height else ''
+    return f'{spec}best[ext=mp4]{_STREAM_DIRECT}/best{_STREAM_DIRECT}'
+
+
+def _stream_media(url, platform, quality, tee):
+    key = media_key(platform, url=url)
+    variant = f'stream:{quality or "default"}'
+    stored = content_store.lookup(key, variant)
+    if stored:
+        return send_media(stored, f'{platform or "video"}_video{os.path.splitext(stored)[1]}')
+
+    # Reuse /api/info's extraction when its signed URLs are still good
+    resolved = get_resolved_info(metadata_cache_key(url, platform))
+    try:
+        with ydl_pool.lease(get_ydl_opts(platform, {'format': _stream_format(quality)})) as ydl:
+            info = ydl.process_ie_result(resolved, download=False) if resolved else ydl.extract_info(url, download=False)
+            media_url = info.get('url') or ''
+            headers = dict(info.get('http_headers') or {})
+            cookie = ydl.cookiejar.get_cookie_header(media_url) if media_url else None
     except Exception as e:
-        return jsonify({'error': f'កំហុស: {e}'}), 500
+        return jsonify({'error': f'Stream mode is not available for this video ({e}); download it normally'}), 409
+    if info.get('_type', 'video') != 'video' or info.get('requested_formats') or not media_url:
+        return jsonify({'error': 'Stream mode needs a single-file format; download it normally'}), 409
+    if cookie:
+        headers['Cookie'] = cookie
+
+    slot = _stream_slot(media_url)
+    if not slot.acquire(STREAM_SLOT_TIMEOUT):
+        resp = jsonify({'error': 'Too many streams from this host right now; retry or download it normally'})
+        resp.headers['Retry-After'] = '30'
+        return resp, 503
+    stack = ExitStack()
+    stack.callback(slot.release)
+    try:
+        status, up_headers, chunks = stack.enter_context(_open_stream(media_url, headers, 60, False,
+                                                                      host_limit=False))
+    except Exception as e:
+        stack.close()
+        return jsonify({'error': f'Upstream request failed: {e}'}), 502
+    if status >= 400:
+        stack.close()
+        return jsonify({'error': f'Upstream returned HTTP {status}'}), 502
+
+    task_id = str(uuid.uuid4())[:8]
+    ext = info.get('ext') or 'mp4'
+    filename = f'{platform or "video"}_video_{task_id}.{ext}'
+    dest = os.path.join(DOWNLOAD_FOLDER, filename)
+    total = int(up_headers.get('content-length') or 0) if not up_headers.get('content-encoding') else 0
+    tee = tee and request.method != 'HEAD'  # no body is sent, so there is nothing to keep
+    tee_state = {'out': None, 'ok': False}
+
+    def finish_tee():
+        if tee_state['out']:
+            tee_state['out'].close()
+        if tee_state['ok']:
+            os.replace(dest + '.part', dest)
+            content_store.ingest(key, variant, filename)
+            download_progress[task_id] = {'status': 'completed', 'percent': 100, 'filename': filename}
+        else:
+            try:
+                os.remove(dest + '.part')
+            except OSError:
+                pass
+            download_progress[task_id] = {'status': 'error', 'error': 'Stream interrupted'}
 
+    if tee:
+        download_progress[task_id] = {'status': 'downloading', 'percent': 0, 'speed': 0, 'eta': 0}
+        stack.callback(finish_tee)
 
-@app.route('/api/download', methods=['POST'])
+    def relay():
+        report = stream_progress(task_id) if tee else None
+        done, started, last = 0, time.time(), 0
+        try:
+            out = tee_state['out'] = open(dest + '.part', 'wb') if tee else None
+            for chunk in chunks:
+                if out:
+                    out.write(chunk)
+                done += len(chunk)
+                now = time.time()
+                if report and now - last >= STREAM_PROGRESS_INTERVAL:
+                    last = now
+                    report(done, total, round(done / max(now - started, 1e-3)))
+                yield chunk
+            tee_state['ok'] = True
+        finally:
+            # Also runs when the client disconnects (GeneratorExit)
+            stack.close()
+
+    resp = Response(relay(), mimetype=up_headers.get('content-type') or mimetypes.guess_type(filename)[0]
+                    or 'application/octet-stream')
+    # A body that is never iterated (HEAD, or a client gone before the first
+    # chunk) doesn't run relay()'s finally; closing the response still frees
+    # the slot, the upstream connection and the tee. ExitStack.close is idempotent.
+    resp.call_on_close(stack.close)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if total:
+        resp.headers['Content-Length'] = str(total)
+    if tee:
+        resp.headers['X-Task-Id'] = task_id
+    return resp
+
+
+@app.route('/api/download', methods=['GET', 'POST'])
 def download_video():
-    data = request.get_json()
+    # GET is only for stream mode, so the URL can be used directly as a link
+    data = request.get_json(silent=True) or request.args.to_dict()
+    stream = str(request.args.get('stream', data.get('stream', ''))).lower() in ('1', 'true')
+    if request.method == 'GET' and not stream:
+        return jsonify({'error': 'Method not allowed'}), 405
     url = data.get('url', '').strip()
     fmt = data.get('format', 'video')
     quality = data.get('quality', '')       # e.g. '720p', '1080p', '4k'
@@ -2940,18 +5446,30 @@ def download_video():
         return jsonify({'error': 'សូមបញ្ចូល URL'}), 400
 
     platform = detect_platform(url) or ''
+    if stream:
+        if fmt == 'audio' or output_fmt not in ('', 'mp4'):
+            return jsonify({'error': 'Stream mode serves the source video file only; download it normally'}), 409
+        tee = str(request.args.get('tee', data.get('tee', ''))).lower() in ('1', 'true')
+        return _stream_media(url, platform, quality, tee)
     task_id = str(uuid.uuid4())[:8]
 
+    # Reuse the info dict /api/info just extracted, unless its signed URLs expired
+    cache_key = metadata_cache_key(url, platform)
+    token = data.get('info_token', '')
+    resolved = get_resolved_info(cache_key) if not token or token == cache_key else None
+
     if fmt == 'audio':
         codec = 'mp3'
         if output_fmt in ('wav', 'flac', 'aac', 'ogg', 'm4a'):
             codec = output_fmt
+        variant = f'audio:{codec}'
         filename = f'{platform}_audio_{task_id}.{codec}'
         ydl_opts = get_ydl_opts(platform, {
             'format': 'bestaudio/best',
             'outtmpl': os.path.join(DOWNLOAD_FOLDER, filename),
             'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': codec, 'preferredquality': '192'}],
             'progress_hooks': [lambda d: progress_hook(d, task_id)],
+            'postprocessor_hooks': [output_index.hook(task_id)],
         })
     else:
         ext = output_fmt if output_fmt in ('mp4', 'mkv', 'webm', 'avi', 'mov') else 'mp4'
@@ -2972,42 +5490,173 @@ def download_video():
             fmt_str = 'bestvideo+bestaudio/best'
         else:
             fmt_str = 'best[ext=mp4]/best'
+        variant = f'video:{quality or "default"}:{ext}'
         filename = f'{platform}_video_{task_id}.{ext}'
         ydl_opts = get_ydl_opts(platform, {
             'format': fmt_str,
             'outtmpl': os.path.join(DOWNLOAD_FOLDER, filename),
             'progress_hooks': [lambda d: progress_hook(d, task_id)],
+            'postprocessor_hooks': [output_index.hook(task_id)],
             'merge_output_format': ext,
         })
 
+    # Already downloaded in this format: link the stored file under this task's name
+    key = media_key(platform, url=url)
+    alias = os.path.splitext(filename)[0]
+    existing = content_store.lookup(key, variant, alias)
+    if existing:
+        download_progress[task_id] = {'status': 'completed', 'percent': 100, 'filename': existing, 'reused': True}
+        return jsonify({'task_id': task_id, 'reused_info': False, 'reused_file': True, 'queue_position': 0})
+
     download_progress[task_id] = {'status': 'starting', 'percent': 0, 'speed': 0, 'eta': 0}
 
+    def fetch():
+        with ydl_pool.lease(ydl_opts) as ydl:
+            ydl_download_with_info(ydl, url, resolved)
+        return os.path.basename(output_index.pop(task_id, filename))
+
     def do_dl():
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-            actual = next((f for f in os.listdir(DOWNLOAD_FOLDER) if task_id in f), filename)
+            # Another task may be fetching the same post right now; wait and share its file
+            actual = content_store.fetch_once(key, variant, alias, fetch)
             download_progress[task_id] = {'status': 'completed', 'percent': 100, 'filename': actual}
         except Exception as e:
             download_progress[task_id] = {'status': 'error', 'error': str(e)}
 
-    threading.Thread(target=do_dl).start()
-    return jsonify({'task_id': task_id})
+    position = submit_job('network', do_dl, priority=PRIORITY_HIGH, job_id=task_id)
+    return jsonify({'task_id': task_id, 'reused_info': resolved is not None, 'queue_position': position})
+
+
+@app.route('/api/jobs/stats')
+def jobs_stats():
+    """Worker-pool queue depths and counters, plus YoutubeDL pool reuse."""
+    stats = {name: pool.stats() for name, pool in job_pools.items()}
+    stats['ydl_pool'] = ydl_pool.stats()
+    stats['cookies'] = cookie_store.stats()
+    stats['content_store'] = content_store.stats()
+    return jsonify(stats)
+
+
+@app.route('/api/tasks/stats')
+def tasks_stats():
+    """In-memory vs persisted task counts per store."""
+    return jsonify({store.name: store.stats()
+                    for store in (download_progress, profile_tasks, watermark_tasks, sora_tasks)})
+
+
+@app.route('/api/jobs/position/<task_id>')
+def job_position(task_id):
+    """Where a submitted task currently sits in its pool's queue (0 = running/done)."""
+    for name, pool in job_pools.items():
+        pos = pool.position(task_id)
+        if pos:
+            return jsonify({'queue': name, 'queue_position': pos})
+    return jsonify({'queue_position': 0})
+
+
+@app.route('/api/storage/stats')
+def storage_stats():
+    """Disk janitor counters, quota settings and current folder usage."""
+    return jsonify(disk_janitor.stats())
+
+
+@app.route('/api/storage/sweep', methods=['POST'])
+def storage_sweep():
+    """Run a janitor pass now instead of waiting for the next interval."""
+    return jsonify(disk_janitor.sweep())
+
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Metadata cache hit/miss counters and sizes."""
+    return jsonify(metadata_cache.stats())
+
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Drop cached metadata for one URL, or everything with {"all": true}."""
+    data = request.get_json() or {}
+    url = data.get('url', '').strip()
+    if data.get('all'):
+        removed = metadata_cache.invalidate()
+    elif url:
+        removed = metadata_cache.invalidate(metadata_cache_key(url))
+    else:
+        return jsonify({'error': 'សូមបញ្ចូល URL'}), 400
+    return jsonify({'success': True, 'removed': removed})
 
 
 @app.route('/api/progress/<task_id>')
 def get_progress(task_id):
-    return jsonify(download_progress.get(task_id, {'status': 'unknown'}))
+    return jsonify(download_progress.snapshot(task_id, {'status': 'unknown'}))
+
+
+@app.route('/api/events/<task_id>')
+def task_event_stream(task_id):
+    """Server-Sent Events stream of a task's progress.
+
+    The first event carries the full state; later events carry only changed
+    keys (removed keys as null). The stream ends after a terminal status;
+    an unknown task gets a single {"status": "unknown"} event, since
+    EventSource cannot read an error response."""
+    store = next((s for s in (download_progress, profile_tasks, watermark_tasks, sora_tasks)
+                  if task_id in s), None)
+    if store is None:
+        return Response('data: {"status": "unknown"}\n\n', mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+
+    def generate():
+        sent = {}
+        version = -1
+        last_write = time.time()
+        while True:
+            version = task_events.wait(task_id, version, SSE_HEARTBEAT)
+            task = store.get(task_id)
+            view = store.view(task) if task is not None else {'status': 'unknown'}
+            delta = {k: v for k, v in view.items() if k not in sent or sent[k] != v}
+            delta.update({k: None for k in sent if k not in view})
+            if delta:
+                yield f'data: {json.dumps(delta, ensure_ascii=False)}\n\n'
+                sent = view
+                last_write = time.time()
+            elif time.time() - last_write >= SSE_HEARTBEAT:
+                yield ': keep-alive\n\n'
+                last_write = time.time()
+            if view.get('status') in TERMINAL_STATUSES:
+                return
+            time.sleep(SSE_MIN_INTERVAL)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/file/<filename>')
 def serve_file(filename):
-    fp = os.path.join(DOWNLOAD_FOLDER, filename)
-    if os.path.exists(fp):
-        return send_file(fp, as_attachment=True)
+    fp = media_path(filename)
+    if fp:
+        return send_media(fp)
     return jsonify({'error': 'រកមិនឃើញឯកសារ'}), 404
 
 
+@app.route('/api/bundle/<task_id>')
+def download_bundle(task_id):
+    """Stream a batch's files as one stored archive (?format=zip, default, or tar)."""
+    entries = _bundle_entries(task_id)
+    if entries is None:
+        return jsonify({'error': 'រកមិនឃើញកិច្ចការ'}), 404
+    if not entries:
+        return jsonify({'error': 'រកមិនឃើញឯកសារ'}), 404
+    kind = 'tar' if request.args.get('format') == 'tar' else 'zip'
+    try:
+        length, chunks = (tar_stream if kind == 'tar' else zip_stream)(entries)
+    except OSError as e:
+        return jsonify({'error': str(e)}), 500
+    resp = Response(chunks, mimetype='application/x-tar' if kind == 'tar' else 'application/zip')
+    resp.headers['Content-Length'] = str(length)
+    resp.headers['Content-Disposition'] = f'attachment; filename="batch_{task_id}.{kind}"'
+    return resp
+
+
 @app.route('/api/profile/grab', methods=['POST'])
 def grab_profile():
     data = request.get_json()
@@ -3041,20 +5690,40 @@ def grab_profile():
         'reddit': grab_reddit_profile,
     }
     target = grabbers.get(platform, lambda u, t, m: grab_universal_profile(u, t, m, platform))
-    threading.Thread(target=target, args=(url, task_id, max_videos)).start()
-    return jsonify({'task_id': task_id, 'platform': platform})
+    position = submit_job('network', target, url, task_id, max_videos, job_id=task_id)
+    return jsonify({'task_id': task_id, 'platform': platform, 'queue_position': position})
+
+
+PROFILE_PAGE_MAX = int(os.environ.get('PROFILE_PAGE_MAX', '500'))  # posts per status page
 
 
 @app.route('/api/profile/status/<task_id>')
 def profile_status(task_id):
-    task = profile_tasks.get(task_id, {'status': 'unknown'})
-    result = {
-        'status': task.get('status'), 'message': task.get('message', ''),
-        'total': task.get('total', 0), 'profile': task.get('profile'),
-        'platform': task.get('platform', ''),
-    }
-    if task.get('status') == 'completed':
-        result['videos'] = task.get('videos', [])
+    """Profile grab status.
+
+    Without query args the full video list is returned once completed.
+    ?offset=&limit= pages through the posts found so far; ?since=N returns
+    only posts after sequence N (pass back list_id to detect a restart, in
+    which case the response has reset=true and starts from 0).
+    """
+    state = profile_tasks.get(task_id)
+    task = state.snapshot() if state is not None else {'status': 'unknown'}
+    args = request.args
+    if not any(k in args for k in ('offset', 'limit', 'since')):
+        return jsonify(_profile_task_view(state or task, with_videos=task.get('status') == 'completed'))
+
+    result = _profile_task_view(state or task)
+    videos = task.get('videos') or []
+    start = max(0, args.get('since', args.get('offset', 0), type=int) or 0)
+    if 'since' in args and args.get('list_id', result['list_id']) != result['list_id']:
+        start = 0
+        result['reset'] = True
+    limit = max(0, min(args.get('limit', PROFILE_PAGE_MAX, type=int), PROFILE_PAGE_MAX))
+    page = videos[start:start + limit]
+    result.update({
+        'videos': page, 'offset': start, 'next_offset': start + len(page),
+        'has_more': start + len(page) < len(videos),
+    })
     return jsonify(result)
 
 
@@ -3071,116 +5740,179 @@ def download_profile_video():
     platform = detect_platform(url) or 'video'
     task_id = str(uuid.uuid4())[:8]
 
+    key = media_key(platform, vid, url)
+    is_photo = media_type == 'photo' and source_url
+    variant = 'photo' if is_photo else 'video:profile:mp4'
+    alias = f'{platform}_photo_{vid}_{task_id}' if is_photo else f'{platform}_{vid}_{task_id}'
+    existing = content_store.lookup(key, variant, alias)
+    if existing:
+        download_progress[task_id] = {'status': 'completed', 'percent': 100, 'filename': existing, 'reused': True}
+        return jsonify({'task_id': task_id, 'reused_file': True, 'queue_position': 0})
+
     # Handle photo download directly via source URL
-    if media_type == 'photo' and source_url:
+    if is_photo:
         download_progress[task_id] = {'status': 'starting', 'percent': 0, 'speed': 0, 'eta': 0}
+        def fetch_photo():
+            ext = 'jpg'
+            if '.png' in source_url.lower():
+                ext = 'png'
+            elif '.webp' in source_url.lower():
+                ext = 'webp'
+            filename = f'{alias}.{ext}'
+            filepath = os.path.join(DOWNLOAD_FOLDER, filename)
+            stream_download(source_url, filepath, timeout=30, progress=stream_progress(task_id))
+            return filename
+
         def do_photo_dl():
             try:
-                ext = 'jpg'
-                if '.png' in source_url.lower():
-                    ext = 'png'
-                elif '.webp' in source_url.lower():
-                    ext = 'webp'
-                filename = f'{platform}_photo_{vid}_{task_id}.{ext}'
-                filepath = os.path.join(DOWNLOAD_FOLDER, filename)
-                with httpx.Client(timeout=30, follow_redirects=True) as c:
-                    r = c.get(source_url)
-                    r.raise_for_status()
-                    with open(filepath, 'wb') as f:
-                        f.write(r.content)
+                filename = content_store.fetch_once(key, variant, alias, fetch_photo)
                 download_progress[task_id] = {'status': 'completed', 'percent': 100, 'filename': filename}
             except Exception as e:
                 download_progress[task_id] = {'status': 'error', 'error': str(e)}
-        threading.Thread(target=do_photo_dl).start()
-        return jsonify({'task_id': task_id})
+        position = submit_job('network', do_photo_dl, priority=PRIORITY_HIGH, job_id=task_id)
+        return jsonify({'task_id': task_id, 'queue_position': position})
 
     filename = f'{platform}_{vid}_{task_id}.mp4'
     ydl_opts = get_ydl_opts(platform, {
         'format': 'best[ext=mp4]/best',
         'outtmpl': os.path.join(DOWNLOAD_FOLDER, filename),
         'progress_hooks': [lambda d: progress_hook(d, task_id)],
+        'postprocessor_hooks': [output_index.hook(task_id)],
         'merge_output_format': 'mp4',
     })
     download_progress[task_id] = {'status': 'starting', 'percent': 0, 'speed': 0, 'eta': 0}
 
+    def fetch():
+        # Graph API videos carry a direct CDN 'source' URL — skip extraction
+        if platform == 'facebook' and source_url:
+            try:
+                stream_download(source_url, os.path.join(DOWNLOAD_FOLDER, filename), timeout=60,
+                                progress=stream_progress(task_id), segmented=True)
+                return filename
+            except Exception as e:
+                logging.warning(f'Facebook source download failed, falling back to yt-dlp: {e}')
+        with ydl_pool.lease(ydl_opts) as ydl:
+            ydl.download([url])
+        return os.path.basename(output_index.pop(task_id, filename))
+
     def do_dl():
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-            actual = next((f for f in os.listdir(DOWNLOAD_FOLDER) if task_id in f), filename)
+            actual = content_store.fetch_once(key, variant, alias, fetch)
             download_progress[task_id] = {'status': 'completed', 'percent': 100, 'filename': actual}
         except Exception as e:
             download_progress[task_id] = {'status': 'error', 'error': str(e)}
 
-    threading.Thread(target=do_dl).start()
-    return jsonify({'task_id': task_id})
+    position = submit_job('network', do_dl, priority=PRIORITY_HIGH, job_id=task_id)
+    return jsonify({'task_id': task_id, 'queue_position': position})
 
 
 @app.route('/api/profile/download-all', methods=['POST'])
 def download_all_profile():
     data = request.get_json()
-    videos = data.get('videos', [])
+    # The same post selected twice (e.g. from merged grabs) is fetched once
+    videos = MediaList('', data.get('videos', []))
     if not videos:
         return jsonify({'error': 'មិនមានវីដេអូ'}), 400
 
     batch_id = str(uuid.uuid4())[:8]
     download_progress[batch_id] = {
         'status': 'batch_starting', 'percent': 0,
-        'total': len(videos), 'completed': 0, 'failed': 0,
+        'total': len(videos), 'completed': 0, 'failed': 0, 'in_flight': 0,
         'current': '', 'files': [],
     }
 
     def do_batch():
         total = len(videos)
-        completed = failed = 0
+        counts = {'completed': 0, 'failed': 0, 'in_flight': 0}
         files = []
+        lock = threading.Lock()
+
+        def report(title=None, **delta):
+            with lock:
+                for k, d in delta.items():
+                    counts[k] += d
+                done = counts['completed'] + counts['failed']
+                update = dict(counts, files=list(files), percent=round(done / total * 100, 1))
+                if title is not None:
+                    update['current'] = title
+                download_progress[batch_id].update(update)
+
+        def fetch_photo(key, vid, source):
+            ext = 'jpg'
+            if '.png' in source.lower(): ext = 'png'
+            elif '.webp' in source.lower(): ext = 'webp'
+            fname = f'batch_{batch_id}_{vid}.{ext}'
+            stream_download(source, os.path.join(DOWNLOAD_FOLDER, fname), timeout=30)
+            return fname
+
+        def fetch_video(key, vid, url):
+            platform = detect_platform(url) or 'video'
+            fname = f'batch_{batch_id}_{vid}.mp4'
+            out_key = f'{batch_id}:{vid}'
+            opts = get_ydl_opts(platform, {
+                'format': 'best[ext=mp4]/best',
+                'outtmpl': os.path.join(DOWNLOAD_FOLDER, fname),
+                'postprocessor_hooks': [output_index.hook(out_key)],
+                'merge_output_format': 'mp4',
+            })
+            with _batch_host_semaphore(url):
+                with ydl_pool.lease(opts) as ydl:
+                    ydl.download([url])
+            return os.path.basename(output_index.pop(out_key, fname))
+
+        def run_item(fetch, title, variant, key, vid, *args):
+            report(title, in_flight=1)
+            try:
+                fname = content_store.fetch_once(key, variant, f'batch_{batch_id}_{vid}',
+                                                 lambda: fetch(key, vid, *args))
+            except Exception as e:
+                logging.warning(f'Batch {batch_id}: {title} failed: {e}')
+                report(in_flight=-1, failed=1)
+                return
+            with lock:
+                files.append(fname)
+            report(in_flight=-1, completed=1)
+
+        download_progress[batch_id]['status'] = 'batch_downloading'
+        futures = []
+        slots = {batch_video_pool: threading.BoundedSemaphore(BATCH_VIDEO_CONCURRENCY),
+                 batch_photo_pool: threading.BoundedSemaphore(BATCH_PHOTO_CONCURRENCY)}
+
+        def submit(pool, *args):
+            slots[pool].acquire()
+            future = pool.submit(run_item, *args)
+            future.add_done_callback(lambda _: slots[pool].release())
+            futures.append(future)
+
         for i, v in enumerate(videos):
             url = v.get('url', '')
+            if not url:
+                report(failed=1); continue
             vid = v.get('id', str(i))
-            media_type = v.get('type', 'video')
+            title = v.get('title', f'Post {i+1}')[:50]
             source = v.get('source', '')
-            if not url: failed += 1; continue
-            download_progress[batch_id].update({
-                'current': v.get('title', f'Post {i+1}')[:50],
-                'percent': round((i / total) * 100, 1),
-            })
-            try:
-                platform = detect_platform(url) or 'video'
-                # Download photo directly from source URL
-                if media_type == 'photo' and source:
-                    ext = 'jpg'
-                    if '.png' in source.lower(): ext = 'png'
-                    elif '.webp' in source.lower(): ext = 'webp'
-                    fname = f'batch_{batch_id}_{vid}.{ext}'
-                    filepath = os.path.join(DOWNLOAD_FOLDER, fname)
-                    with httpx.Client(timeout=30, follow_redirects=True) as c:
-                        r = c.get(source)
-                        r.raise_for_status()
-                        with open(filepath, 'wb') as fw:
-                            fw.write(r.content)
-                    files.append(fname); completed += 1
-                else:
-                    fname = f'batch_{batch_id}_{vid}.mp4'
-                    opts = get_ydl_opts(platform, {
-                        'format': 'best[ext=mp4]/best',
-                        'outtmpl': os.path.join(DOWNLOAD_FOLDER, fname),
-                        'merge_output_format': 'mp4',
-                    })
-                    with YoutubeDL(opts) as ydl:
-                        ydl.download([url])
-                    actual = next((f for f in os.listdir(DOWNLOAD_FOLDER) if f'batch_{batch_id}_{vid}' in f), fname)
-                    files.append(actual); completed += 1
-            except Exception:
-                failed += 1
-            download_progress[batch_id].update({'completed': completed, 'failed': failed, 'files': files})
-            time.sleep(0.5)
-        download_progress[batch_id].update({
-            'status': 'batch_completed', 'percent': 100,
-            'completed': completed, 'failed': failed, 'files': files,
-        })
+            is_photo = v.get('type', 'video') == 'photo' and source
+            # Posts already in the content store are linked, not fetched again
+            key = media_key(detect_platform(url) or 'video', v.get('id'), url)
+            variant = 'photo' if is_photo else 'video:profile:mp4'
+            existing = content_store.lookup(key, variant, f'batch_{batch_id}_{vid}')
+            if existing:
+                with lock:
+                    files.append(existing)
+                report(title, completed=1)
+            # Photos come straight from their source URL
+            elif is_photo:
+                submit(batch_photo_pool, fetch_photo, title, variant, key, vid, source)
+            else:
+                submit(batch_video_pool, fetch_video, title, variant, key, vid, url)
+        wait(futures)
+        with lock:
+            download_progress[batch_id].update(dict(
+                counts, status='batch_completed', percent=100, files=list(files),
+            ))
 
-    threading.Thread(target=do_batch).start()
-    return jsonify({'task_id': batch_id, 'total': len(videos)})
+    position = submit_job('network', do_batch, priority=PRIORITY_LOW, job_id=batch_id)
+    return jsonify({'task_id': batch_id, 'total': len(videos), 'queue_position': position})
 
 
 @app.route('/api/comments', methods=['POST'])
@@ -3224,6 +5956,7 @@ def clean_downloads():
             fp = os.path.join(DOWNLOAD_FOLDER, f)
             if os.path.isfile(fp):
                 os.remove(fp)
+        content_store.clear()
         return jsonify({'message': f'បានលុប {count} ឯកសារ'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -3236,20 +5969,10 @@ def cookies_status():
     if cfile:
         # Check which platforms have cookies
         platforms_with_cookies = set()
-        try:
-            with open(cfile, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    parts = line.split('\t')
-                    if len(parts) >= 7:
-                        domain = parts[0].lower()
-                        if 'facebook' in domain: platforms_with_cookies.add('facebook')
-                        if 'instagram' in domain: platforms_with_cookies.add('instagram')
-                        if 'twitter' in domain or 'x.com' in domain: platforms_with_cookies.add('twitter')
-        except Exception:
-            pass
+        for domain in cookie_store.domains():
+            if 'facebook' in domain: platforms_with_cookies.add('facebook')
+            if 'instagram' in domain: platforms_with_cookies.add('instagram')
+            if 'twitter' in domain or 'x.com' in domain: platforms_with_cookies.add('twitter')
         return jsonify({
             'has_cookies': True,
             'file': 'cookies.txt',
@@ -3267,12 +5990,16 @@ def upload_cookies():
         if text and ('# Netscape HTTP Cookie File' in text or '.facebook.com' in text):
             with open(COOKIES_FILE, 'w', encoding='utf-8') as f:
                 f.write(text)
+            cookie_store.refresh(force=True)
+            invalidate_ydl_opts()
             return jsonify({'success': True, 'message': 'បានរក្សាទុក cookies.txt'})
         return jsonify({'error': 'សូមភ្ជាប់ file cookies.txt'}), 400
     
     f = request.files['file']
     if f.filename:
         f.save(COOKIES_FILE)
+        cookie_store.refresh(force=True)
+        invalidate_ydl_opts()
         return jsonify({'success': True, 'message': 'បានរក្សាទុក cookies.txt'})
     return jsonify({'error': 'File is empty'}), 400
 
@@ -3376,8 +6103,8 @@ def ffmpeg_convert_route():
         except Exception as e:
             download_progress[task_id] = {'status': 'error', 'error': str(e)}
 
-    threading.Thread(target=do_convert).start()
-    return jsonify({'task_id': task_id, 'output_filename': out_filename})
+    position = submit_job('cpu', do_convert, job_id=task_id)
+    return jsonify({'task_id': task_id, 'output_filename': out_filename, 'queue_position': position})
 
 
 @app.route('/api/ffmpeg/media-info', methods=['POST'])
@@ -3403,7 +6130,7 @@ def ffmpeg_media_info_route():
 
 
 # ==================== Watermark Remover ====================
-watermark_tasks = {}
+watermark_tasks = TaskStore('watermark')
 
 @app.route('/api/watermark/remove', methods=['POST'])
 def watermark_remove():
@@ -3455,13 +6182,9 @@ def watermark_remove():
             if nwm_url:
                 # Download no-watermark version directly
                 try:
-                    with httpx.Client(timeout=60, follow_redirects=True) as c:
-                        r = c.get(nwm_url)
-                        if r.status_code == 200:
-                            with open(dl_path, 'wb') as f:
-                                f.write(r.content)
-                            input_path = dl_path
-                            cleanup_input = True
+                    stream_download(nwm_url, dl_path, timeout=60, segmented=True)
+                    input_path = dl_path
+                    cleanup_input = True
                 except Exception:
                     pass
 
@@ -3471,11 +6194,11 @@ def watermark_remove():
                     'format': 'best[ext=mp4]/best',
                     'outtmpl': dl_path,
                     'quiet': True,
+                    'postprocessor_hooks': [output_index.hook(task_id)],
                 })
-                with YoutubeDL(opts) as ydl:
+                with ydl_pool.lease(opts) as ydl:
                     ydl.download([video_url])
-                # Find the actual downloaded file
-                actual = next((os.path.join(DOWNLOAD_FOLDER, f) for f in os.listdir(DOWNLOAD_FOLDER) if task_id in f), dl_path)
+                actual = output_index.pop(task_id, dl_path)
                 if os.path.isfile(actual):
                     input_path = actual
                     cleanup_input = True
@@ -3568,14 +6291,14 @@ def watermark_remove():
         except Exception as e:
             watermark_tasks[task_id] = {'status': 'error', 'error': str(e)}
 
-    threading.Thread(target=do_remove).start()
-    return jsonify({'task_id': task_id, 'original': os.path.basename(input_path)})
+    position = submit_job('cpu', do_remove, job_id=task_id)
+    return jsonify({'task_id': task_id, 'original': os.path.basename(input_path), 'queue_position': position})
 
 
 @app.route('/api/watermark/progress/<task_id>')
 def watermark_progress(task_id):
     """Check watermark removal progress."""
-    return jsonify(watermark_tasks.get(task_id, {'status': 'unknown'}))
+    return jsonify(watermark_tasks.snapshot(task_id, {'status': 'unknown'}))
 
 
 @app.route('/api/watermark/upload', methods=['POST'])
@@ -3776,9 +6499,10 @@ def _sora_fetch_from_html(url):
         return None
 
 
-def _sora_download_video(url, task_id):
+def _sora_download_video(url, task_id, progress=None):
     """Download a Sora video. Tries API first, then HTML scrape, then yt-dlp fallback.
-    Returns dict with 'path' and 'has_watermark' keys, or None on failure."""
+    Returns dict with 'path' and 'has_watermark' keys, or None on failure.
+    progress(downloaded, total, speed) receives byte progress of direct downloads."""
     dl_filename = f'sora_input_{task_id}.mp4'
     dl_path = os.path.join(DOWNLOAD_FOLDER, dl_filename)
     video_url = None
@@ -3811,17 +6535,8 @@ def _sora_download_video(url, task_id):
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
                 'Referer': 'https://sora.chatgpt.com/',
             }
-            if HAS_CURL_CFFI:
-                session = cffi_requests.Session(impersonate='chrome110')
-                r = session.get(video_url, headers=dl_headers, timeout=120)
-                with open(dl_path, 'wb') as f:
-                    f.write(r.content)
-            else:
-                with httpx.Client(timeout=120, follow_redirects=True) as c:
-                    r = c.get(video_url, headers=dl_headers)
-                    r.raise_for_status()
-                    with open(dl_path, 'wb') as f:
-                        f.write(r.content)
+            stream_download(video_url, dl_path, headers=dl_headers, timeout=120,
+                            progress=progress, impersonate=True, segmented=True)
 
             if os.path.isfile(dl_path) and os.path.getsize(dl_path) > 10000:
                 logging.info(f'Sora: downloaded {os.path.getsize(dl_path)} bytes to {dl_path}')
@@ -3836,19 +6551,19 @@ def _sora_download_video(url, task_id):
     # --- Method 4: yt-dlp fallback (generic extractor) ---
     logging.info(f'Sora: trying yt-dlp fallback for {url}')
     try:
+        out_key = f'sora:{task_id}'
         opts = get_ydl_opts('sora', {
             'format': 'best[ext=mp4]/best',
             'outtmpl': dl_path,
             'quiet': True,
             'no_warnings': True,
+            'postprocessor_hooks': [output_index.hook(out_key)],
         })
-        with YoutubeDL(opts) as ydl:
+        with ydl_pool.lease(opts) as ydl:
             ydl.download([url])
-        if os.path.isfile(dl_path):
-            return {'path': dl_path, 'has_watermark': True}  # yt-dlp = assume watermarked
-        for f in os.listdir(DOWNLOAD_FOLDER):
-            if task_id in f and f.startswith('sora_input_'):
-                return {'path': os.path.join(DOWNLOAD_FOLDER, f), 'has_watermark': True}
+        actual = output_index.pop(out_key, dl_path)
+        if os.path.isfile(actual):
+            return {'path': actual, 'has_watermark': True}  # yt-dlp = assume watermarked
     except Exception as e:
         logging.error(f'Sora yt-dlp fallback failed: {e}')
 
@@ -3998,18 +6713,20 @@ def _sora_process_batch(task_id, urls, settings):
         url = url.strip()
         if not url:
             continue
-        task['current'] = i + 1
-        task['current_url'] = url
-        task['status'] = 'downloading'
-        task['ai_progress'] = 0
         # Overall percent: each video = 100/total, split into download (20%) + processing (80%)
         base_pct = int((i / total) * 100)
-        task['percent'] = base_pct
+        task.update({'current': i + 1, 'current_url': url, 'status': 'downloading',
+                     'ai_progress': 0, 'percent': base_pct})
 
         try:
             # Step 1: Download Sora video
             vid_id = f'{task_id}_{i}'
-            dl_result = _sora_download_video(url, vid_id)
+
+            def dl_progress(downloaded, size, speed):
+                task.update({'downloaded_bytes': downloaded, 'total_bytes': size, 'speed': speed})
+                if size:
+                    task['percent'] = base_pct + int(downloaded / size * 20 / total)
+            dl_result = _sora_download_video(url, vid_id, progress=dl_progress)
             if not dl_result or not os.path.isfile(dl_result.get('path', '')):
                 errors.append({'url': url, 'error': 'Failed to download video from Sora'})
                 continue
@@ -4082,15 +6799,19 @@ def sora_bulk_download():
     if isinstance(urls_raw, str):
         urls_raw = [u.strip() for u in urls_raw.split('\n') if u.strip()]
 
-    # Validate URLs
+    # Validate URLs; the same post pasted twice is processed once
     valid_urls = []
     invalid = []
+    seen = set()
     for u in urls_raw:
         u = u.strip()
         if not u:
             continue
         if _is_sora_url(u):
-            valid_urls.append(u)
+            key = media_key('sora', url=u) or ('sora', u)
+            if key not in seen:
+                seen.add(key)
+                valid_urls.append(u)
         else:
             invalid.append(u)
 
@@ -4112,18 +6833,21 @@ def sora_bulk_download():
         'invalid': invalid,
     }
 
-    threading.Thread(target=_sora_process_batch, args=(task_id, valid_urls, settings)).start()
+    # Download + FFmpeg re-encode per URL: capped by the CPU pool
+    position = submit_job('cpu', _sora_process_batch, task_id, valid_urls, settings,
+                          priority=PRIORITY_LOW, job_id=task_id)
     return jsonify({
         'task_id': task_id,
         'total': len(valid_urls),
         'invalid': invalid,
+        'queue_position': position,
     })
 
 
 @app.route('/api/sora/status/<task_id>')
 def sora_status(task_id):
     """Check Sora2 bulk download task status."""
-    task = sora_tasks.get(task_id)
+    task = sora_tasks.snapshot(task_id)
     if not task:
         return jsonify({'status': 'unknown'}), 404
     return jsonify(task)
@@ -4132,20 +6856,19 @@ def sora_status(task_id):
 @app.route('/api/sora/download-file/<task_dir>/<filename>')
 def sora_download_file(task_dir, filename):
     """Download a processed Sora video file."""
-    safe_dir = os.path.join(DOWNLOAD_FOLDER, task_dir)
-    safe_file = os.path.join(safe_dir, filename)
-    if not os.path.isfile(safe_file):
+    safe_file = media_path(task_dir, filename)
+    if not safe_file:
         return jsonify({'error': 'File not found'}), 404
-    return send_file(safe_file, as_attachment=True, download_name=filename)
+    return send_media(safe_file, download_name=filename)
 
 
 @app.route('/api/sora/download-original/<filename>')
 def sora_download_original(filename):
     """Download the original (with watermark) Sora video."""
-    safe_file = os.path.join(DOWNLOAD_FOLDER, filename)
-    if not os.path.isfile(safe_file):
+    safe_file = media_path(filename)
+    if not safe_file:
         return jsonify({'error': 'File not found'}), 404
-    return send_file(safe_file, as_attachment=True, download_name=filename)
+    return send_media(safe_file, download_name=filename)
 
 
 # ==================== Save Location ====================
@@ -0,0 +1,96 @@
+"""
+Microbenchmark for app.classify_url over a synthetic 100k-URL corpus.
+
+    python bench_classify_url.py [--count 100000] [--seed 1]
+
+Compares the host-table classifier (cold and warm cache) with the previous
+per-call approach: ordered substring scan for the platform, then re.search
+over the raw pattern lists for the profile check, username and media ID.
+"""
+import argparse, random, re, string, time
+
+import app
+
+TEMPLATES = [
+    'https://www.tiktok.com/@{user}/video/{num}',
+    'https://www.tiktok.com/@{user}',
+    'https://vm.tiktok.com/{token}/',
+    'https://www.douyin.com/video/{num}',
+    'https://www.douyin.com/user/{token}',
+    'https://www.youtube.com/watch?v={yt}',
+    'https://youtu.be/{yt}',
+    'https://www.youtube.com/@{user}',
+    'https://www.instagram.com/p/{token}/',
+    'https://www.instagram.com/{user}/',
+    'https://www.facebook.com/{user}/videos/{num}',
+    'https://www.facebook.com/{user}',
+    'https://fb.watch/{token}/',
+    'https://x.com/{user}/status/{num}',
+    'https://twitter.com/{user}',
+    'https://www.pinterest.com/pin/{num}/',
+    'https://www.kuaishou.com/short-video/{token}',
+    'https://sora.chatgpt.com/p/s_{hex}',
+    'https://www.xiaohongshu.com/explore/{hex}',
+    'https://www.threads.net/@{user}/post/{token}',
+    'https://www.reddit.com/r/{user}/comments/{token}/',
+    'https://www.bilibili.com/video/BV{token}',
+    'https://space.bilibili.com/{num}',
+    'https://weibo.com/{num}/{token}',
+    'https://www.zhihu.com/people/{user}',
+    'https://h5.pipix.com/item/{num}',
+    'https://example.com/watch/{num}',
+]
+
+
+def make_corpus(count, seed):
+    rnd = random.Random(seed)
+    alnum = string.ascii_letters + string.digits
+
+    def word(n):
+        return ''.join(rnd.choice(alnum) for _ in range(n))
+
+    return [rnd.choice(TEMPLATES).format(
+        user=word(rnd.randint(4, 14)), num=rnd.randint(10 ** 15, 10 ** 19), token=word(10),
+        yt=word(11), hex=''.join(rnd.choice('0123456789abcdef') for _ in range(32)),
+    ) for _ in range(count)]
+
+
+def legacy(url):
+    platform = app._platform_by_substring(url.lower())
+    profile = any(re.search(p, url, re.I) for p in app._PROFILE_PATTERNS.get(platform, []))
+    pat = app._USERNAME_PATTERNS.get(platform)
+    m = re.search(pat, url, re.I) if pat else None
+    pat = app._VIDEO_ID_PATTERNS.get(platform)
+    v = re.search(pat, url, re.I) if pat else None
+    return platform, profile, m.group(1) if m else None, v and next(g for g in v.groups() if g)
+
+
+def timed(label, fn, urls):
+    start = time.perf_counter()
+    for url in urls:
+        fn(url)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed * 1000:9.1f} ms  {elapsed / len(urls) * 1e6:7.2f} us/url')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    urls = make_corpus(args.count, args.seed)
+    print(f'{len(urls)} URLs, {len(set(urls))} unique')
+    timed('legacy (scan + re.search)', legacy, urls)
+    app.classify_url.cache_clear()
+    timed('classify_url (cold)', app.classify_url, urls)
+    # Repeat lookups of the same URL within one request hit the LRU cache
+    hot = urls[-app.URL_CLASSIFY_CACHE:]
+    timed('classify_url (warm)', app.classify_url, hot)
+
+    differ = sum(legacy(u)[0] != app.classify_url(u).platform for u in urls)
+    print(f'platform differs from legacy on {differ} URLs')
+
+
+if __name__ == '__main__':
+    main()
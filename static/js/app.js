@@ -72,6 +72,36 @@
         return d;
     }
 
+    // Live task progress — Server-Sent Events, falling back to polling pollUrl.
+    // onUpdate(state, stop) gets the merged task state on every change.
+    function watchTask(tid, pollUrl, interval, onUpdate) {
+        let state = {}, timer = null, es = null, stopped = false;
+        const stop = () => { stopped = true; if (es) es.close(); if (timer) clearInterval(timer); };
+        const poll = () => {
+            if (es) { es.close(); es = null; }
+            if (stopped || timer) return;
+            timer = setInterval(async () => {
+                try { const r = await fetch(pollUrl); state = await r.json(); onUpdate(state, stop); } catch(e) {}
+            }, interval);
+        };
+        if (!window.EventSource) { poll(); return { stop }; }
+        let opened = false;
+        es = new EventSource(`/api/events/${tid}`);
+        es.onopen = () => { opened = true; state = {}; };  // every (re)connect starts with the full state
+        es.onmessage = e => {
+            const delta = JSON.parse(e.data);
+            for (const k in delta) { if (delta[k] === null) delete state[k]; else state[k] = delta[k]; }
+            // Evicted or not yet known to this server: the poll endpoint has the final word
+            if (state.status === 'unknown') { poll(); return; }
+            onUpdate(state, stop);
+        };
+        es.onerror = () => {
+            // Never connected (proxy buffering...) or the browser gave up on the stream — poll instead
+            if (es && (!opened || es.readyState === EventSource.CLOSED)) poll();
+        };
+        return { stop };
+    }
+
     // Tabs
     const tabBtns = document.querySelectorAll('.tab-btn');
     const tabContents = document.querySelectorAll('.tab-content');
@@ -253,31 +283,28 @@
             const body = {url: currentVideoInfo.url, format: fmt};
             if (qualitySel && qualitySel.value) body.quality = qualitySel.value;
             if (formatSel && formatSel.value) body.output_format = formatSel.value;
+            if (currentVideoInfo.info_token) body.info_token = currentVideoInfo.info_token;
             const d = await safeFetchJSON('/api/download', { method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify(body) });
             if (d.task_id) pollDL(d.task_id);
         } catch(e) { hide(progressSection); errorMessage.textContent = e.message||'Download error'; show(errorSection); }
     }
 
     function pollDL(tid) {
-        if (pollTimer) clearInterval(pollTimer);
-        pollTimer = setInterval(async () => {
-            try {
-                const r = await fetch(`/api/progress/${tid}`);
-                const d = await r.json();
-                if (d.status === 'downloading') {
-                    progressBar.style.width = (d.percent||0)+'%'; progressPercent.textContent = (d.percent||0)+'%';
-                    progressStatus.textContent = `${fmtSpeed(d.speed)} ${d.eta? '• '+d.eta+'s':''}`;
-                } else if (d.status === 'processing') {
-                    progressBar.style.width = '100%'; progressPercent.textContent = '100%'; progressStatus.textContent = 'កំពុងបំលែង...';
-                } else if (d.status === 'completed') {
-                    clearInterval(pollTimer); hide(progressSection);
-                    downloadLink.href = `/api/file/${d.filename}`; downloadLink.download = d.filename; show(completeSection);
-                } else if (d.status === 'error') {
-                    clearInterval(pollTimer); hide(progressSection);
-                    errorMessage.textContent = d.error || 'Download failed'; show(errorSection);
-                }
-            } catch(e) {}
-        }, 800);
+        if (pollTimer) pollTimer.stop();
+        pollTimer = watchTask(tid, `/api/progress/${tid}`, 800, (d, stop) => {
+            if (d.status === 'downloading') {
+                progressBar.style.width = (d.percent||0)+'%'; progressPercent.textContent = (d.percent||0)+'%';
+                progressStatus.textContent = `${fmtSpeed(d.speed)} ${d.eta? '• '+d.eta+'s':''}`;
+            } else if (d.status === 'processing') {
+                progressBar.style.width = '100%'; progressPercent.textContent = '100%'; progressStatus.textContent = 'កំពុងបំលែង...';
+            } else if (d.status === 'completed') {
+                stop(); hide(progressSection);
+                downloadLink.href = `/api/file/${d.filename}`; downloadLink.download = d.filename; show(completeSection);
+            } else if (d.status === 'error') {
+                stop(); hide(progressSection);
+                errorMessage.textContent = d.error || 'Download failed'; show(errorSection);
+            }
+        });
     }
 
     // ==================== Comments ====================
@@ -369,28 +396,52 @@
     }
 
     function pollProfile(tid) {
-        if (profilePollTimer) clearInterval(profilePollTimer);
-        profilePollTimer = setInterval(async () => {
-            try {
-                const r = await fetch(`/api/profile/status/${tid}`);
-                const d = await r.json();
-                if (['starting','getting_profile','grabbing'].includes(d.status)) {
-                    profileLoadingText.textContent = d.message || 'កំពុងស្វែងរក...';
-                    if (d.total > 0) { profileLoadingCount.textContent = `${d.total} posts`; show(profileLoadingCount); }
-                    if (d.profile && d.status === 'grabbing') showProfileInfo(d.profile);
-                } else if (d.status === 'completed') {
-                    clearInterval(profilePollTimer); hide(profileLoadingSection); grabBtn.disabled = false;
-                    if (d.profile) showProfileInfo(d.profile);
-                    profileVideos = d.videos || [];
-                    displayedVideos = [...profileVideos];
-                    renderGrid(displayedVideos); computeAnalytics(profileVideos);
+        if (profilePollTimer) profilePollTimer.stop();
+        // Posts are pulled incrementally (?since=N) as the grabber finds them,
+        // so each request only carries new posts.
+        let loaded = [], listId = null, syncing = null;
+        videoGrid.innerHTML = '';
+        const pull = async () => {
+            for (;;) {
+                const q = new URLSearchParams({ since: loaded.length });
+                if (listId) q.set('list_id', listId);
+                const r = await safeFetchJSON(`/api/profile/status/${tid}?${q}`);
+                if (r.reset) { loaded = []; videoGrid.innerHTML = ''; }
+                listId = r.list_id;
+                const from = loaded.length;
+                loaded.push(...(r.videos || []));
+                if (loaded.length > from) {
+                    // Stream new posts into the grid while the grab is still running
+                    profileVideos = displayedVideos = loaded;
+                    for (let i = from; i < loaded.length; i++) videoGrid.appendChild(createGridItem(loaded[i], i));
+                    videoCountLabel.textContent = `${loaded.length} posts`;
                     show(profileResultSection);
-                } else if (d.status === 'error') {
-                    clearInterval(profilePollTimer); hide(profileLoadingSection);
-                    profileErrorMessage.innerHTML = esc(d.message || 'Error').replace(/\n/g,'<br>'); show(profileErrorSection); grabBtn.disabled = false;
                 }
-            } catch(e) {}
-        }, 1200);
+                if (!r.has_more) return;
+            }
+        };
+        const sync = () => syncing || (syncing = pull().finally(() => { syncing = null; }));
+        const behind = d => loaded.length < (d.seq || 0) || (d.list_id && d.list_id !== listId);
+        profilePollTimer = watchTask(tid, `/api/profile/status/${tid}?limit=0`, 1200, async (d, stop) => {
+            if (['starting','getting_profile','grabbing'].includes(d.status)) {
+                profileLoadingText.textContent = d.message || 'កំពុងស្វែងរក...';
+                if (d.total > 0) { profileLoadingCount.textContent = `${d.total} posts`; show(profileLoadingCount); }
+                if (d.profile && d.status === 'grabbing') showProfileInfo(d.profile);
+                if (behind(d)) sync().catch(() => {});
+            } else if (d.status === 'completed') {
+                stop();
+                try { for (let i = 0; i < 20 && behind(d); i++) await sync(); } catch(e) {}
+                hide(profileLoadingSection); grabBtn.disabled = false;
+                if (d.profile) showProfileInfo(d.profile);
+                profileVideos = loaded;
+                displayedVideos = [...profileVideos];
+                renderGrid(displayedVideos); computeAnalytics(profileVideos);
+                show(profileResultSection);
+            } else if (d.status === 'error') {
+                stop(); hide(profileLoadingSection);
+                profileErrorMessage.innerHTML = esc(d.message || 'Error').replace(/\n/g,'<br>'); show(profileErrorSection); grabBtn.disabled = false;
+            }
+        });
     }
 
     function showProfileInfo(info) {
@@ -554,21 +605,17 @@
     }
 
     function pollItemDL(tid, btn) {
-        const t = setInterval(async () => {
-            try {
-                const r = await fetch(`/api/progress/${tid}`);
-                const d = await r.json();
-                if (d.status === 'downloading') { btn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> ${d.percent||0}%`; }
-                else if (d.status === 'completed') {
-                    clearInterval(t); btn.classList.add('done'); btn.innerHTML = '<i class="fas fa-check"></i> Done';
-                    const a = document.createElement('a'); a.href = `/api/file/${d.filename}`; a.download = d.filename;
-                    document.body.appendChild(a); a.click(); document.body.removeChild(a);
-                } else if (d.status === 'error') {
-                    clearInterval(t); btn.disabled = false; btn.innerHTML = '<i class="fas fa-times"></i> Error';
-                    setTimeout(() => { btn.innerHTML = '<i class="fas fa-download"></i> ទាញយក'; btn.classList.remove('done'); }, 3000);
-                }
-            } catch(e) {}
-        }, 1000);
+        watchTask(tid, `/api/progress/${tid}`, 1000, (d, stop) => {
+            if (d.status === 'downloading') { btn.innerHTML = `<i class="fas fa-spinner fa-spin"></i> ${d.percent||0}%`; }
+            else if (d.status === 'completed') {
+                stop(); btn.classList.add('done'); btn.innerHTML = '<i class="fas fa-check"></i> Done';
+                const a = document.createElement('a'); a.href = `/api/file/${d.filename}`; a.download = d.filename;
+                document.body.appendChild(a); a.click(); document.body.removeChild(a);
+            } else if (d.status === 'error') {
+                stop(); btn.disabled = false; btn.innerHTML = '<i class="fas fa-times"></i> Error';
+                setTimeout(() => { btn.innerHTML = '<i class="fas fa-download"></i> ទាញយក'; btn.classList.remove('done'); }, 3000);
+            }
+        });
     }
 
     // ==================== Profile: Batch Download ====================
@@ -593,28 +640,27 @@
     }
 
     function pollBatch(tid) {
-        const t = setInterval(async () => {
-            try {
-                const r = await fetch(`/api/progress/${tid}`);
-                const d = await r.json();
-                batchBar.style.width = (d.percent||0)+'%'; batchPercent.textContent = Math.round(d.percent||0)+'%';
-                batchOK.textContent = d.completed||0; batchFail.textContent = d.failed||0;
-                if (d.status === 'batch_starting' || !d.status || d.status === 'downloading') {
-                    batchStatus.textContent = d.current || 'កំពុងទាញយក...';
-                } else if (d.status === 'batch_completed') {
-                    clearInterval(t); batchBar.style.width = '100%'; batchPercent.textContent = '100%';
-                    batchTitle.textContent = 'ទាញយករួចរាល់!';
-                    batchStatus.textContent = `${d.completed||0}/${d.total||0} posts`;
-                    downloadSelectedBtn.disabled = false;
-                    if (d.files && d.files.length) {
-                        d.files.forEach((f, i) => setTimeout(() => {
-                            const a = document.createElement('a'); a.href = `/api/file/${f}`; a.download = f;
-                            document.body.appendChild(a); a.click(); document.body.removeChild(a);
-                        }, i*500));
-                    }
+        watchTask(tid, `/api/progress/${tid}`, 1500, (d, stop) => {
+            batchBar.style.width = (d.percent||0)+'%'; batchPercent.textContent = Math.round(d.percent||0)+'%';
+            batchOK.textContent = d.completed||0; batchFail.textContent = d.failed||0;
+            if (d.status === 'batch_starting' || d.status === 'batch_downloading' || !d.status || d.status === 'downloading') {
+                const active = d.in_flight > 1 ? ` (+${d.in_flight - 1})` : '';
+                batchStatus.textContent = d.current ? d.current + active : 'កំពុងទាញយក...';
+            } else if (d.status === 'batch_completed') {
+                stop(); batchBar.style.width = '100%'; batchPercent.textContent = '100%';
+                batchTitle.textContent = 'ទាញយករួចរាល់!';
+                batchStatus.textContent = `${d.completed||0}/${d.total||0} posts`;
+                downloadSelectedBtn.disabled = false;
+                if (d.files && d.files.length) {
+                    // Several files arrive as one streamed ZIP instead of one download each
+                    const f = d.files[0], many = d.files.length > 1;
+                    const a = document.createElement('a');
+                    a.href = many ? `/api/bundle/${tid}` : `/api/file/${encodeURIComponent(f)}`;
+                    a.download = many ? `batch_${tid}.zip` : f;
+                    document.body.appendChild(a); a.click(); document.body.removeChild(a);
                 }
-            } catch(e) {}
-        }, 1500);
+            }
+        });
     }
 
     // ==================== Search ====================
@@ -1115,36 +1161,31 @@
                 const taskId = d.task_id;
                 const origFile = d.original;
 
-                // Poll progress
+                // Watch progress
                 if (wmProcessText) wmProcessText.textContent = 'កំពុងលុប Watermark...';
-                const pollInterval = setInterval(async () => {
-                    try {
-                        const pr = await fetch(`/api/watermark/progress/${taskId}`);
-                        const pd = await pr.json();
-
-                        if (pd.status === 'completed') {
-                            clearInterval(pollInterval);
-                            if (wmProcessing) wmProcessing.style.display = 'none';
-                            if (wmSuccessSection) wmSuccessSection.style.display = '';
-
-                            // Set videos for comparison
-                            if (wmOrigVideo && origFile) wmOrigVideo.src = `/api/file/${encodeURIComponent(origFile)}`;
-                            if (wmResultVideo && pd.filename) wmResultVideo.src = `/api/file/${encodeURIComponent(pd.filename)}`;
-                            if (wmDownloadLink && pd.filename) wmDownloadLink.href = `/api/file/${encodeURIComponent(pd.filename)}`;
-
-                            wmRemoveBtn.disabled = false;
-                            wmRemoveBtn.querySelector('span').textContent = 'លុប Watermark';
-                        } else if (pd.status === 'error') {
-                            clearInterval(pollInterval);
-                            wmShowError(pd.error || 'កំហុសក្នុងការលុប Watermark');
-                        } else {
-                            // Update progress
-                            const pct = pd.percent || 0;
-                            if (wmProgressFill) wmProgressFill.style.width = pct + '%';
-                            if (wmProgressLabel) wmProgressLabel.textContent = pct + '%';
-                        }
-                    } catch(e) { /* keep polling */ }
-                }, 2000);
+                watchTask(taskId, `/api/watermark/progress/${taskId}`, 2000, (pd, stop) => {
+                    if (pd.status === 'completed') {
+                        stop();
+                        if (wmProcessing) wmProcessing.style.display = 'none';
+                        if (wmSuccessSection) wmSuccessSection.style.display = '';
+
+                        // Set videos for comparison
+                        if (wmOrigVideo && origFile) wmOrigVideo.src = `/api/file/${encodeURIComponent(origFile)}`;
+                        if (wmResultVideo && pd.filename) wmResultVideo.src = `/api/file/${encodeURIComponent(pd.filename)}`;
+                        if (wmDownloadLink && pd.filename) wmDownloadLink.href = `/api/file/${encodeURIComponent(pd.filename)}`;
+
+                        wmRemoveBtn.disabled = false;
+                        wmRemoveBtn.querySelector('span').textContent = 'លុប Watermark';
+                    } else if (pd.status === 'error') {
+                        stop();
+                        wmShowError(pd.error || 'កំហុសក្នុងការលុប Watermark');
+                    } else {
+                        // Update progress
+                        const pct = pd.percent || 0;
+                        if (wmProgressFill) wmProgressFill.style.width = pct + '%';
+                        if (wmProgressLabel) wmProgressLabel.textContent = pct + '%';
+                    }
+                });
 
             } catch(e) {
                 wmShowError('កំហុសក្នុងការតភ្ជាប់ Server');
@@ -1430,40 +1471,34 @@
                 const total = d.total;
                 if (sora2ProgressLabel) sora2ProgressLabel.textContent = `0 / ${total}`;
 
-                // Poll status
-                const pollInterval = setInterval(async () => {
-                    try {
-                        const sr = await fetch(`/api/sora/status/${taskId}`);
-                        const sd = await sr.json();
-
-                        if (sd.status === 'completed') {
-                            clearInterval(pollInterval);
-                            sora2ShowResults(sd);
-                            return;
-                        }
-
-                        // Update progress
-                        const pct = sd.percent || 0;
-                        const cur = sd.current || 0;
-                        const tot = sd.total || total;
-                        const aiProg = sd.ai_progress || 0;
-                        if (sora2ProgressFill) sora2ProgressFill.style.width = pct + '%';
-                        if (sora2ProgressLabel) sora2ProgressLabel.textContent = `${cur} / ${tot}`;
-
-                        // Show step info
-                        const stepLabel = sd.status === 'downloading' ? 'Downloading HD video...' :
-                                         sd.status === 'removing_watermark' ? `Removing watermark... (${aiProg}%)` :
-                                         'Processing...';
-                        if (sora2ProcessText) sora2ProcessText.textContent = `Video ${cur}/${tot} — ${stepLabel}`;
-                        if (sora2ProcessTitle) sora2ProcessTitle.textContent = stepLabel;
-
-                        if (sora2CurrentUrl && sd.current_url) {
-                            const short = sd.current_url.length > 60 ? sd.current_url.substring(0, 60) + '...' : sd.current_url;
-                            sora2CurrentUrl.textContent = short;
-                        }
+                // Watch status
+                watchTask(taskId, `/api/sora/status/${taskId}`, 2000, (sd, stop) => {
+                    if (sd.status === 'completed') {
+                        stop();
+                        sora2ShowResults(sd);
+                        return;
+                    }
 
-                    } catch(e) { /* keep polling */ }
-                }, 2000);
+                    // Update progress
+                    const pct = sd.percent || 0;
+                    const cur = sd.current || 0;
+                    const tot = sd.total || total;
+                    const aiProg = sd.ai_progress || 0;
+                    if (sora2ProgressFill) sora2ProgressFill.style.width = pct + '%';
+                    if (sora2ProgressLabel) sora2ProgressLabel.textContent = `${cur} / ${tot}`;
+
+                    // Show step info
+                    const stepLabel = sd.status === 'downloading' ? 'Downloading HD video...' :
+                                     sd.status === 'removing_watermark' ? `Removing watermark... (${aiProg}%)` :
+                                     'Processing...';
+                    if (sora2ProcessText) sora2ProcessText.textContent = `Video ${cur}/${tot} — ${stepLabel}`;
+                    if (sora2ProcessTitle) sora2ProcessTitle.textContent = stepLabel;
+
+                    if (sora2CurrentUrl && sd.current_url) {
+                        const short = sd.current_url.length > 60 ? sd.current_url.substring(0, 60) + '...' : sd.current_url;
+                        sora2CurrentUrl.textContent = short;
+                    }
+                });
 
             } catch(e) {
                 sora2ShowError('Network error. Please try again.');